@@ -0,0 +1,3 @@
+# The advisory core (advisor.core) and its HTTP API (advisor.api) import pandas and the market data,
+# so only the lightweight client is exported here
+from advisor.client import AdvisorClient, LocalAdvisor, get_advisor
@@ -0,0 +1,170 @@
+import argparse
+import math
+import multiprocessing
+import socket
+
+from flask import Flask, Response, jsonify, request, stream_with_context
+from werkzeug.serving import make_server
+
+from advisor import core
+from llm_client import LLMError
+from parser_1 import DEFAULT_CITY, UnknownCityError, available_cities, get_market_data, get_neighbourhood_data, get_price_forecast
+
+# Stateless HTTP API over the advisory core. Clients keep the conversation and send it with every
+# request, so any worker can answer any request:
+#
+#     python -m advisor.api --port 8000 --workers 4
+#
+# or under any WSGI server, e.g. gunicorn -w 4 advisor.api:app
+
+app = Flask(__name__)
+
+
+def json_safe(value):
+    # Market data holds NaN for months without listings, which JSON does not
+    if isinstance(value, dict):
+        return {str(key): json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [json_safe(item) for item in value]
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def advice_arguments():
+    # (profile, messages), or (None, None) for a body the core cannot use
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return None, None
+    profile = body.get('profile') or {}
+    messages = body.get('messages') or []
+    if not isinstance(profile, dict) or not isinstance(messages, list):
+        return None, None
+    try:
+        profile = core.normalize_profile(profile)
+    except (TypeError, ValueError):
+        return None, None
+    messages = [
+        {'role': message['role'], 'content': message['content']}
+        for message in messages
+        if isinstance(message, dict) and message.get('role') in ('user', 'assistant', 'system')
+        and isinstance(message.get('content'), str)
+    ]
+    return profile, messages
+
+
+@app.errorhandler(UnknownCityError)
+def unknown_city(error):
+    return jsonify(error=str(error)), 404
+
+
+@app.get("/health")
+def health():
+    return jsonify(status="ok")
+
+
+@app.get("/cities")
+def cities():
+    return jsonify(available_cities())
+
+
+@app.get("/market-data")
+def market_data():
+    rooms = request.args.get('rooms', 0, type=int)
+    city = request.args.get('city', DEFAULT_CITY)
+    return jsonify(json_safe(get_market_data(rooms, city)))
+
+
+@app.get("/forecast")
+def forecast():
+    rooms = request.args.get('rooms', 0, type=int)
+    city = request.args.get('city', DEFAULT_CITY)
+    return jsonify(get_price_forecast(rooms, city))
+
+
+@app.get("/neighbourhood")
+def neighbourhood():
+    # Median price per m2 within radius_km of lat/lon and the k nearest comparable listings
+    latitude = request.args.get('lat', type=float)
+    longitude = request.args.get('lon', type=float)
+    radius_km = request.args.get('radius_km', 1.0, type=float)
+    k = request.args.get('k', 5, type=int)
+    if not all(value is not None and math.isfinite(value) for value in (latitude, longitude, radius_km)) or radius_km <= 0:
+        return jsonify(error="lat and lon are required; lat, lon and radius_km must be finite and radius_km positive"), 400
+    if not 1 <= k <= 50:
+        return jsonify(error="k must be between 1 and 50"), 400
+    rooms = request.args.get('rooms', 0, type=int)
+    city = request.args.get('city', DEFAULT_CITY)
+    return jsonify(json_safe(get_neighbourhood_data(latitude, longitude, radius_km, rooms, k, city=city)))
+
+
+@app.post("/advice")
+def advice():
+    profile, messages = advice_arguments()
+    if profile is None:
+        return jsonify(error="Invalid profile"), 400
+    try:
+        reply = core.advise(profile, messages)
+    except LLMError as e:
+        return jsonify(error=str(e), status_code=e.status_code), 502
+    return jsonify(reply=reply)
+
+
+@app.post("/advice/stream")
+def advice_stream():
+    # Plain text chunks in the order the model produces them. The first chunk is fetched before the
+    # response starts, so errors up to then get a proper status; a later LLMError aborts the chunked
+    # response, which clients see as a broken stream rather than as part of the reply.
+    profile, messages = advice_arguments()
+    if profile is None:
+        return jsonify(error="Invalid profile"), 400
+    chunks = core.stream_advice(profile, messages)
+    try:
+        first = next(chunks, "")
+    except LLMError as e:
+        return jsonify(error=str(e), status_code=e.status_code), 502
+
+    def body():
+        yield first
+        yield from chunks
+    return Response(stream_with_context(body()), mimetype='text/plain; charset=utf-8')
+
+
+def run_worker(host, port, fd):
+    make_server(host, port, app, threaded=True, fd=fd).serve_forever()
+
+
+def serve(host="127.0.0.1", port=8000, workers=4):
+    # Pre-fork: the parent binds the socket and loads the default city's market data once, so workers
+    # start warm and share those pages copy-on-write. Every worker accepts from the same socket and
+    # answers requests on its own threads.
+    if DEFAULT_CITY in available_cities():
+        get_market_data(0, DEFAULT_CITY)
+    listener = socket.create_server((host, port), backlog=128)
+    listener.set_inheritable(True)
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=run_worker, args=(host, port, listener.fileno()), daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    print(f"Advisor API listening on http://{host}:{port} with {workers} workers")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+    finally:
+        listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the real estate advisor over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4, help="worker processes")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import threading
+
+import requests
+
+from llm_client import LLMError
+
+# Where the advisor API runs; without it the UI calls the advisory core in-process
+ADVISOR_API_URL_ENV = "ADVISOR_API_URL"
+
+
+class AdvisorClient:
+    # Talks to advisor.api. Holds no per-user state: the caller passes the conversation every time.
+    def __init__(self, base_url, timeout=(5, 180)):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def request(self, method, path, stream=False, **kwargs):
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, stream=stream, **kwargs)
+        except requests.exceptions.RequestException as e:
+            raise LLMError(f"Advisor API unreachable: {e}") from e
+        if response.status_code != 200:
+            try:
+                message = response.json().get('error', response.text)
+            except ValueError:
+                message = response.text
+            raise LLMError(message, response.status_code)
+        return response
+
+    def cities(self):
+        return self.request('GET', '/cities').json()
+
+    def market_data(self, number_of_rooms, city):
+        return self.request('GET', '/market-data', params={'rooms': number_of_rooms, 'city': city}).json()
+
+    def forecast(self, number_of_rooms, city):
+        return self.request('GET', '/forecast', params={'rooms': number_of_rooms, 'city': city}).json()
+
+    def neighbourhood(self, latitude, longitude, radius_km, number_of_rooms, city):
+        params = {'lat': latitude, 'lon': longitude, 'radius_km': radius_km, 'rooms': number_of_rooms, 'city': city}
+        return self.request('GET', '/neighbourhood', params=params).json()
+
+    def advise(self, profile, messages):
+        return self.request('POST', '/advice', json={'profile': profile, 'messages': messages}).json()['reply']
+
+    def stream_advice(self, profile, messages):
+        response = self.request('POST', '/advice/stream', stream=True, json={'profile': profile, 'messages': messages})
+        response.encoding = 'utf-8'
+        with response:
+            try:
+                for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                    if chunk:
+                        yield chunk
+            except requests.exceptions.RequestException as e:
+                # The API aborts the stream when the model fails part way through a reply
+                raise LLMError(f"Advice stream interrupted: {e}") from e
+
+
+class LocalAdvisor:
+    # Same interface as AdvisorClient, answered in this process. The core (and with it pandas and the
+    # datasets) is only imported on first use.
+    def cities(self):
+        from parser_1 import available_cities
+        return available_cities()
+
+    def market_data(self, number_of_rooms, city):
+        from parser_1 import get_market_data
+        return get_market_data(number_of_rooms, city)
+
+    def forecast(self, number_of_rooms, city):
+        from parser_1 import get_price_forecast
+        return get_price_forecast(number_of_rooms, city)
+
+    def neighbourhood(self, latitude, longitude, radius_km, number_of_rooms, city):
+        from parser_1 import get_neighbourhood_data
+        return get_neighbourhood_data(latitude, longitude, radius_km, number_of_rooms, city=city)
+
+    def advise(self, profile, messages):
+        from advisor.core import advise
+        return advise(profile, messages)
+
+    def stream_advice(self, profile, messages):
+        from advisor.core import stream_advice
+        return stream_advice(profile, messages)
+
+
+_default_advisor = None
+_default_advisor_lock = threading.Lock()
+
+
+def get_advisor():
+    # Shared by every UI session of this process
+    global _default_advisor
+    with _default_advisor_lock:
+        if _default_advisor is None:
+            api_url = os.environ.get(ADVISOR_API_URL_ENV)
+            _default_advisor = AdvisorClient(api_url) if api_url else LocalAdvisor()
+        return _default_advisor
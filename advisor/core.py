@@ -0,0 +1,163 @@
+import math
+
+from llm_client import get_default_client
+from parser_1 import DEFAULT_CITY, get_affordable_listings, get_market_rows, get_inflation_series, get_neighbourhood_data, get_price_forecast
+from prompt_builder import DEFAULT_TOKEN_BUDGET, build_user_content, format_affordable, format_forecast, format_neighbourhood, format_number
+from response_cache import get_default_response_cache
+
+SYSTEM_PROMPT = (
+    "You are a real estate advisor specializing in the Polish market. "
+    "Your task is to provide detailed advice based on the client's investment purpose, risk preference, budget, number of rooms, current market data, and inflation rates. "
+    "Use the provided market data and inflation rates to give precise and actionable recommendations. "
+    "Be professional, detailed, and ensure your advice is practical and based on real data. "
+    "We are in 2024 July at the moment, if you are going to give advice, take this into consideration. "
+    "After providing your advice, predict the median prices for the upcoming years based on the current median prices and inflation rates. "
+    "Provide the predicted prices in the following format: 'Year,Month,Predicted Median Price'. Each prediction should be on a new line. "
+    "For example: "
+    "2024,August,150000\n"
+    "2025,August,160000\n"
+    "2026,August,170000\n"
+    "Please strictly adhere to this format for the predicted prices."
+)
+
+# A client profile as sent by the UI, the batch runner or the HTTP API; missing fields take these values
+PROFILE_DEFAULTS = {
+    'investment_purpose': 'Long-term investment',
+    'risk_preference': 'Medium risk, medium return',
+    'min_budget': 0,
+    'max_budget': 0,
+    'number_of_rooms': 0,
+    'city': DEFAULT_CITY,
+    'live_median_price': None,
+    # Where the client wants to buy; with both set the prompt quotes neighbourhood comparables
+    'latitude': None,
+    'longitude': None,
+}
+NUMERIC_FIELDS = ['min_budget', 'max_budget', 'number_of_rooms']
+OPTIONAL_NUMERIC_FIELDS = ['live_median_price', 'latitude', 'longitude']
+TEXT_FIELDS = ['investment_purpose', 'risk_preference', 'city']
+
+# Radius of the neighbourhood summary for a profile with a location
+NEIGHBOURHOOD_RADIUS_KM = 1.0
+
+
+def finite_number(field, value):
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"{field} must be a finite number, got {value!r}")
+    return number
+
+
+def normalize_profile(profile):
+    # Raises ValueError for budgets, room counts, live prices or coordinates that are not finite
+    # numbers and for text fields such as the city that are not strings
+    normalized = dict(PROFILE_DEFAULTS)
+    normalized.update({field: value for field, value in profile.items() if field in PROFILE_DEFAULTS and value not in (None, '')})
+    for field in NUMERIC_FIELDS:
+        normalized[field] = int(finite_number(field, normalized[field]))
+    for field in OPTIONAL_NUMERIC_FIELDS:
+        if normalized[field] is not None:
+            normalized[field] = finite_number(field, normalized[field])
+    for field in TEXT_FIELDS:
+        if not isinstance(normalized[field], str):
+            raise ValueError(f"{field} must be a string, got {normalized[field]!r}")
+    return normalized
+
+
+def build_advisory_request(investment_purpose, risk_preference, min_budget, max_budget, number_of_rooms,
+                           city=DEFAULT_CITY, history_messages=(), live_median_price=None,
+                           token_budget=DEFAULT_TOKEN_BUDGET, location=None):
+    # The chat completion request for one client profile
+    system_message = {"role": "system", "content": SYSTEM_PROMPT}
+
+    profile = [
+        ("City", city.capitalize()),
+        ("Investment Purpose", investment_purpose),
+        ("Risk Preference", risk_preference),
+        ("Minimum Budget", min_budget),
+        ("Maximum Budget", max_budget),
+        ("Number of Rooms", number_of_rooms),
+    ]
+    extra = [("Local Forecast (PLN, 95% band)", format_forecast(get_price_forecast(number_of_rooms, city)))]
+    if min_budget or max_budget:
+        # What the budget actually buys in the latest snapshot, so advice is grounded in real listings
+        affordable = get_affordable_listings(min_budget, max_budget, number_of_rooms, city)
+        extra.append(("Listings in Budget (latest month)", format_affordable(affordable) if affordable['count'] else "none"))
+    if live_median_price:
+        extra.append(("Live Median Price", format_number(live_median_price)))
+    if location is not None:
+        # Comparables around the client's chosen spot rather than city-wide figures only
+        neighbourhood = get_neighbourhood_data(location[0], location[1], NEIGHBOURHOOD_RADIUS_KM, number_of_rooms, city=city)
+        extra.append((f"Neighbourhood ({NEIGHBOURHOOD_RADIUS_KM:g} km)", format_neighbourhood(neighbourhood)))
+    user_message = {
+        "role": "user",
+        "content": build_user_content(
+            profile,
+            get_market_rows(number_of_rooms, city),
+            get_inflation_series(),
+            extra,
+            token_budget=token_budget,
+        )
+    }
+
+    return {
+        "model": "gpt-4",
+        "messages": [system_message, user_message] + list(history_messages),
+        "temperature": 0.7,
+        "max_tokens": 2048,
+        "n": 1,
+        "stream": False
+    }
+
+
+def profile_location(profile):
+    # (latitude, longitude) when the profile has both, else None
+    if profile['latitude'] is None or profile['longitude'] is None:
+        return None
+    return profile['latitude'], profile['longitude']
+
+
+def profile_request(profile, messages=(), token_budget=DEFAULT_TOKEN_BUDGET):
+    profile = normalize_profile(profile)
+    return build_advisory_request(
+        profile['investment_purpose'],
+        profile['risk_preference'],
+        profile['min_budget'],
+        profile['max_budget'],
+        profile['number_of_rooms'],
+        city=profile['city'],
+        history_messages=messages,
+        live_median_price=profile['live_median_price'],
+        token_budget=token_budget,
+        location=profile_location(profile),
+    )
+
+
+def advise(profile, messages=(), token_budget=DEFAULT_TOKEN_BUDGET):
+    # One reply for a profile and the conversation so far (which the caller keeps); raises LLMError
+    api_request = profile_request(profile, messages, token_budget)
+    response_cache = get_default_response_cache()
+    reply = response_cache.get(api_request)
+    if reply is None:
+        reply = get_default_client().complete(api_request)
+        response_cache.set(api_request, reply)
+    return reply
+
+
+def stream_advice(profile, messages=(), token_budget=DEFAULT_TOKEN_BUDGET):
+    # Same reply as advise, yielded token by token; raises LLMError, possibly after some chunks, so an
+    # error is never mistaken for part of the reply
+    api_request = profile_request(profile, messages, token_budget)
+
+    # An identical request that was answered before is replayed in one piece
+    response_cache = get_default_response_cache()
+    cached_reply = response_cache.get(api_request)
+    if cached_reply is not None:
+        yield cached_reply
+        return
+
+    chunks = []
+    for content in get_default_client().stream(api_request):
+        chunks.append(content)
+        yield content
+    response_cache.set(api_request, "".join(chunks))
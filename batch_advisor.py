@@ -0,0 +1,155 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from advisor.core import normalize_profile, profile_request
+from llm_client import API_ENDPOINT, LLMClient, LLMError
+from parser_1 import UnknownCityError, available_cities, get_market_rows, get_price_forecast
+from rate_limit import TokenBucket
+from response_cache import get_default_response_cache
+from snapshot_store import normalize_city
+
+# Run many client profiles through the advisor offline:
+#
+#     python batch_advisor.py profiles.jsonl results.jsonl --concurrency 8 --rate 2
+#
+# Profiles are JSONL or CSV rows with investment_purpose, risk_preference, min_budget, max_budget,
+# number_of_rooms and optionally id, city, question and latitude/longitude (for neighbourhood
+# comparables). Results are appended to the output JSONL as they complete; rerunning with the same
+# output skips profiles that already have a response.
+
+def parse_rows(path):
+    # Raw rows in file order; a JSONL line that is not valid JSON becomes its ValueError
+    with open(path, newline='') as f:
+        if path.endswith('.csv'):
+            return list(csv.DictReader(f))
+        rows = []
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as e:
+                rows.append(e)
+        return rows
+
+
+def read_profiles(path):
+    # (profiles, invalid): rows that are not a usable profile become {'id', 'error'} records
+    # instead of stopping the batch
+    profiles = []
+    invalid = []
+    for position, row in enumerate(parse_rows(path)):
+        if isinstance(row, dict):
+            row_id = str(row.get('id') or position)
+            try:
+                profile = normalize_profile(row)
+            except (TypeError, ValueError) as e:
+                invalid.append({'id': row_id, 'error': f"Invalid profile: {e}"})
+                continue
+            profile['question'] = row.get('question') or ''
+            profile['id'] = row_id
+            profiles.append(profile)
+        else:
+            reason = row if isinstance(row, ValueError) else "not a JSON object"
+            invalid.append({'id': str(position), 'error': f"Invalid profile: {reason}"})
+    return profiles, invalid
+
+
+def completed_ids(output_path):
+    # Profiles that already have a response; failed ones are retried on the next run
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run
+                continue
+            if 'response' in record:
+                done.add(record['id'])
+    return done
+
+
+def warm_market_data(profiles):
+    # Market rows and forecasts are computed once per distinct (rooms, city) before requests fan out
+    # Unknown cities are left to fail per profile
+    cities = set(available_cities())
+    keys = {(profile['number_of_rooms'], profile['city']) for profile in profiles if normalize_city(profile['city']) in cities}
+    for number_of_rooms, city in keys:
+        get_market_rows(number_of_rooms, city)
+        get_price_forecast(number_of_rooms, city)
+    return len(keys)
+
+
+def advise(profile, client, bucket, response_cache):
+    history_messages = [{"role": "user", "content": profile['question']}] if profile['question'] else []
+    api_request = profile_request(profile, history_messages)
+    started = time.monotonic()
+    response = response_cache.get(api_request)
+    if response is None:
+        bucket.acquire()
+        response = client.complete(api_request)
+        response_cache.set(api_request, response)
+    return response, time.monotonic() - started
+
+
+def run_batch(input_path, output_path, concurrency=4, rate=1.0, client=None):
+    profiles, invalid = read_profiles(input_path)
+    done = completed_ids(output_path)
+    pending = [profile for profile in profiles if profile['id'] not in done]
+    invalid = [record for record in invalid if record['id'] not in done]
+    print(f"{len(profiles) + len(invalid)} profiles, {len(done)} already done, {len(pending)} to run, {len(invalid)} invalid")
+    print(f"Market data prepared for {warm_market_data(pending)} distinct (rooms, city) combinations")
+
+    if client is None:
+        client = LLMClient(max_concurrency=concurrency)
+    # Requests per second across all workers; bursts up to the concurrency limit
+    bucket = TokenBucket(rate, max(1, concurrency))
+    response_cache = get_default_response_cache()
+
+    summary = {'succeeded': 0, 'failed': len(invalid), 'skipped': len(done)}
+    started = time.monotonic()
+    with open(output_path, 'a') as output, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for record in invalid:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+        futures = {executor.submit(advise, profile, client, bucket, response_cache): profile for profile in pending}
+        for future in as_completed(futures):
+            profile = futures[future]
+            record = {'id': profile['id'], 'profile': profile}
+            try:
+                record['response'], record['elapsed'] = future.result()
+                summary['succeeded'] += 1
+            except (LLMError, UnknownCityError) as e:
+                record['error'] = str(e)
+                summary['failed'] += 1
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # Flushed per record so an interrupted run loses at most the requests in flight
+            output.flush()
+
+    summary['elapsed'] = time.monotonic() - started
+    print(f"Done: {summary}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run client profiles through the real estate advisor in bulk.")
+    parser.add_argument("input", help="profiles as .jsonl or .csv")
+    parser.add_argument("output", help="results .jsonl; appended to and used to resume")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--rate", type=float, default=1.0, help="maximum requests per second")
+    parser.add_argument("--endpoint", default=API_ENDPOINT, help="chat completions endpoint")
+    args = parser.parse_args()
+
+    client = LLMClient(api_endpoint=args.endpoint, max_concurrency=args.concurrency)
+    run_batch(args.input, args.output, args.concurrency, args.rate, client)
+
+
+if __name__ == "__main__":
+    main()
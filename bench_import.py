@@ -0,0 +1,90 @@
+import argparse
+import ast
+import subprocess
+import sys
+
+# Cold import time of what each entry point loads before it can serve, measured with
+# `python -X importtime` in fresh interpreters (best of --runs). Exits with status 1 when an entry
+# point exceeds its budget, so it can gate CI:
+#
+#     python bench_import.py --runs 5
+
+# Entry point -> budget in ms. Scripts are measured by their top-level imports (so an eager
+# `import pandas` added to chatbot.py shows up here); modules are measured by importing them.
+IMPORT_BUDGETS_MS = {
+    'chatbot.py': 550,
+    'real_estate.py': 550,
+    'batch_advisor': 900,
+    'advisor.api': 1100,
+    'parser_1': 800,
+}
+
+
+def script_imports(path):
+    # Modules imported at the top level of a Streamlit script; imports inside functions are lazy
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return modules
+
+
+def import_times(modules):
+    # {top-level module: cumulative microseconds} for one fresh interpreter
+    statement = "; ".join(f"import {module}" for module in modules) or "pass"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {modules} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Nested imports are indented; only top-level ones add up to the total
+        if not name[1:].startswith(" "):
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(modules, runs):
+    # Best-of-runs total in ms with the interpreter's own startup imports subtracted, plus the
+    # slowest modules of the best run
+    startup = [import_times([]) for _ in range(runs)]
+    baseline = min(sum(times.values()) for times in startup)
+    best = None
+    for _ in range(runs):
+        times = import_times(modules)
+        if best is None or sum(times.values()) < sum(best.values()):
+            best = times
+    slowest = sorted(((name, us) for name, us in best.items() if name not in startup[0]), key=lambda item: -item[1])[:3]
+    return (sum(best.values()) - baseline) / 1000, [(name, us / 1000) for name, us in slowest]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check cold import time of each entry point against its budget.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per entry point; the fastest counts")
+    parser.add_argument("--slack", type=float, default=1.0, help="multiply every budget, e.g. 1.5 on slow CI machines")
+    args = parser.parse_args()
+
+    failed = []
+    for entry_point, budget in IMPORT_BUDGETS_MS.items():
+        modules = script_imports(entry_point) if entry_point.endswith(".py") else [entry_point]
+        total, slowest = measure(modules, args.runs)
+        limit = budget * args.slack
+        status = "ok" if total <= limit else "OVER BUDGET"
+        details = ", ".join(f"{name} {ms:.0f}" for name, ms in slowest)
+        print(f"{entry_point:<16} {total:7.0f} ms / {limit:5.0f} ms  {status:<11}  slowest: {details}")
+        if total > limit:
+            failed.append(entry_point)
+
+    if failed:
+        print(f"Import time regression in: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
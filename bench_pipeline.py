@@ -0,0 +1,297 @@
+import argparse
+import calendar
+import contextlib
+import io
+import json
+import os
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# End-to-end timings of the advisory pipeline's hot paths: snapshot ingest, get_market_data for every
+# room count, prompt construction, forecast-line parsing and chart frames, and LLM/scraper round trips
+# against the local mock servers with injected latency. The pipeline runs over dataset/ as it is and
+# over synthetic copies of the latest --months snapshots of each kind enlarged --scales times, each the
+# best of --runs fresh interpreters with an empty store. Every run is appended to --history; a
+# benchmark more than --threshold times the median of its last runs on this machine is a regression
+# and makes the script exit with status 1, like bench_import.py:
+#
+#     python bench_pipeline.py --scales 1 10 100
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_DIR = os.path.join(REPO_DIR, "dataset")
+INFLATION_CSV_NAME = "poland_inflation_rates_oecd.csv"
+
+HISTORY_PATH = os.path.join(REPO_DIR, "bench_history.jsonl")
+# Previous runs of a benchmark its baseline is the median of
+HISTORY_WINDOW = 5
+REGRESSION_RATIO = 1.25
+# Differences below this many ms (or MB) are noise, whatever the ratio
+MIN_REGRESSION = 1.0
+
+# Round trips made per timing against the mock servers
+ROUND_TRIPS = 10
+CRAWLS = 3
+# Budgets the profiles of the prompt benchmark ask about
+PROMPT_BUDGETS = (400000, 900000)
+
+# A reply in the format the system prompt asks for: prose, then three years of forecast lines
+FORECAST_REPLY = "Buy now.\n" + "".join(
+    f"{2025 + month // 12},{calendar.month_name[month % 12 + 1]},{1000000 + 5000 * month}\n" for month in range(36)
+)
+
+
+def best_ms(function, runs=1):
+    # Fastest of runs calls in ms
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - started) * 1000)
+    return min(times)
+
+
+def enlarge_snapshot(source, target, factor, seed=0):
+    # factor copies of a snapshot with distinct ids (the first 4 hex digits carry the copy number, so a
+    # listing keeps its id across months) and prices jittered by ~2%, written one copy at a time
+    import numpy as np
+    import pandas as pd
+    df = pd.read_csv(source, dtype=str, keep_default_na=False)
+    id_suffixes = df['id'].str[4:].to_numpy(dtype=str)
+    prices = pd.to_numeric(df['price'], errors='coerce').to_numpy()
+    rng = np.random.default_rng(seed)
+    with open(target, "w", newline="") as f:
+        for copy in range(factor):
+            jitter = 1 + rng.normal(0, 0.02, len(df)) if copy else 1.0
+            jittered = pd.Series(np.round(prices * jitter), index=df.index).astype('Int64')
+            enlarged = df.assign(
+                id=np.char.add(f"{copy:04x}", id_suffixes),
+                price=jittered.astype(str).where(jittered.notna(), ''),
+            )
+            enlarged.to_csv(f, header=copy == 0, index=False)
+
+
+def prepare_dataset(workdir, scale, months):
+    # workdir/dataset/ holding dataset/ as it is (scale None) or the latest `months` snapshots of each
+    # kind enlarged scale times
+    from snapshot_store import discover_snapshots, parse_snapshot_name
+    dataset_dir = os.path.join(workdir, "dataset")
+    os.makedirs(dataset_dir)
+    shutil.copy(os.path.join(DATASET_DIR, INFLATION_CSV_NAME), dataset_dir)
+    snapshots = discover_snapshots(DATASET_DIR)
+    if scale is not None:
+        latest = []
+        for kind in ['sale', 'rent']:
+            latest += [path for path in snapshots if parse_snapshot_name(path)[0] == kind][-months:]
+        snapshots = latest
+    for path in snapshots:
+        target = os.path.join(dataset_dir, os.path.basename(path))
+        if scale is None:
+            os.symlink(path, target)
+        else:
+            enlarge_snapshot(path, target, scale)
+    return sum(os.path.getsize(os.path.join(dataset_dir, name)) for name in os.listdir(dataset_dir))
+
+
+def pipeline_benchmarks(workers):
+    # Runs in a fresh interpreter inside the prepared workdir, so every cache starts cold
+    from advisor.core import profile_request
+    from forecast_lines import ForecastStreamParser, forecast_dataframe, local_forecast_dataframe
+    from ingest_data import build_derived
+    from macro_series import INFLATION_CSV, ingest_series_csv
+    from market_cube import ALL_ROOMS
+    import parser_1
+    from snapshot_store import discover_snapshots, ingest
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        def run_ingest():
+            build_derived(ingest(discover_snapshots(), workers=workers))
+            ingest_series_csv('inflation', INFLATION_CSV)
+        results['ingest'] = best_ms(run_ingest)
+        # Nothing changed, so only the manifest and cached aggregates are checked
+        results['ingest_unchanged'] = best_ms(run_ingest)
+
+    results['market_cube'] = best_ms(lambda: parser_1.get_market_cube())
+    cube = parser_1.get_market_cube()
+    room_counts = [0] + sorted({rooms for (_, _, _, rooms) in cube.cells if rooms is not ALL_ROOMS})
+    # First request for every room count builds yields, histories and real medians; later ones hit the cache
+    results['market_data_cold'] = best_ms(lambda: [parser_1.get_market_data(rooms) for rooms in room_counts])
+    results['market_data_warm'] = best_ms(lambda: [parser_1.get_market_data(rooms) for rooms in room_counts], runs=5) / len(room_counts)
+
+    profiles = [
+        {'number_of_rooms': rooms, 'min_budget': PROMPT_BUDGETS[0], 'max_budget': PROMPT_BUDGETS[1]}
+        for rooms in room_counts
+    ]
+    # Cold adds the forecasts and the budget index
+    results['prompt_cold'] = best_ms(lambda: [profile_request(profile) for profile in profiles])
+    results['prompt'] = best_ms(lambda: [profile_request(profile) for profile in profiles], runs=5) / len(profiles)
+
+    def parse_reply():
+        # As the chat page does: 8-character chunks, then a chart frame
+        parser = ForecastStreamParser()
+        for start in range(0, len(FORECAST_REPLY), 8):
+            parser.feed(FORECAST_REPLY[start:start + 8])
+        parser.close()
+        return forecast_dataframe(parser.rows)
+    results['forecast_parse'] = best_ms(parse_reply, runs=20)
+    results['local_forecast_frame'] = best_ms(lambda: local_forecast_dataframe(parser_1.get_price_forecast(0)), runs=20)
+
+    # Including the ingest worker processes
+    results['peak_rss_mb'] = max(resource.getrusage(who).ru_maxrss for who in [resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN]) / 1024
+    return results
+
+
+def run_pipeline(scale, months, workers, runs, timeout):
+    # {benchmark: fastest value over runs} for one dataset, each run in a fresh interpreter with an empty
+    # store, plus the dataset's size on disk in MB
+    best = {}
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as workdir:
+        size = prepare_dataset(workdir, scale, months)
+        results_path = os.path.join(workdir, "results.json")
+        command = [sys.executable, os.path.abspath(__file__), "--pipeline-run", results_path]
+        if workers:
+            command += ["--workers", str(workers)]
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])))
+        for _ in range(runs):
+            shutil.rmtree(os.path.join(workdir, "dataset", "store"), ignore_errors=True)
+            result = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True, timeout=timeout)
+            if result.returncode != 0:
+                raise RuntimeError(f"Pipeline run failed:\n{result.stderr[-2000:]}")
+            with open(results_path) as f:
+                for name, value in json.load(f).items():
+                    best[name] = min(value, best.get(name, value))
+    best['dataset_mb'] = size / 1e6
+    return best
+
+
+def round_trip_benchmarks(latency):
+    # Mean ms per LLM reply (whole and streamed) and fastest sampled crawl, with `latency` s added per request
+    from html_parser import OtodomScraper
+    from llm_client import LLMClient
+    from mock_llm_server import run_mock_llm_server
+    from mock_otodom_server import run_mock_otodom_server, synthetic_page
+    from rate_limit import TokenBucket
+
+    results = {}
+    api_request = {"model": "gpt-4", "messages": [{"role": "user", "content": "Advice please"}], "max_tokens": 2048}
+    with run_mock_llm_server(reply=FORECAST_REPLY, latency=latency) as server:
+        client = LLMClient(api_endpoint=server.url, api_key="bench")
+        client.complete(api_request)
+        results['llm_complete'] = best_ms(lambda: [client.complete(api_request) for _ in range(ROUND_TRIPS)], runs=3) / ROUND_TRIPS
+        results['llm_stream'] = best_ms(lambda: [list(client.stream(api_request)) for _ in range(ROUND_TRIPS)], runs=3) / ROUND_TRIPS
+        client.close()
+
+    total_pages = 50
+    pages = {page: synthetic_page(total_pages, [300000 + 1000 * page + i for i in range(36)]) for page in range(1, total_pages + 1)}
+    with run_mock_otodom_server(pages, latency=latency) as server:
+        def crawl():
+            # A fresh page cache each time, so every page goes over the wire; no rate limiting
+            with tempfile.TemporaryDirectory() as cache_dir, contextlib.redirect_stdout(io.StringIO()):
+                OtodomScraper(server.url, {'page': 1}, bucket=TokenBucket(1000, 1000), cache_dir=cache_dir).crawl()
+        results['scraper_crawl'] = best_ms(crawl, runs=CRAWLS)
+    return results
+
+
+def read_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def baseline(history, host, settings, run, name):
+    # Median of the benchmark over the last HISTORY_WINDOW runs on this machine with the same settings,
+    # or None before the first one
+    values = [
+        record['results'][run][name]
+        for record in history
+        if record['host'] == host and record['settings'] == settings and name in record['results'].get(run, {})
+    ][-HISTORY_WINDOW:]
+    return statistics.median(values) if values else None
+
+
+def git_commit():
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the advisory pipeline end to end and flag regressions.")
+    parser.add_argument("--scales", type=int, nargs="*", default=[1, 10, 100], help="enlargement factors of the synthetic runs")
+    parser.add_argument("--months", type=int, default=1, help="latest snapshots of each kind enlarged for the synthetic runs")
+    parser.add_argument("--runs", type=int, default=3, help="fresh pipeline runs per dataset; the fastest counts")
+    parser.add_argument("--workers", type=int, default=None, help="ingest processes (default: one per core)")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the mock servers wait before answering")
+    parser.add_argument("--timeout", type=float, default=3600, help="seconds before a pipeline run counts as failed")
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSON lines file results are appended to")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_RATIO, help="slowdown over the recorded median that fails")
+    parser.add_argument("--no-record", action="store_true", help="compare against the history without appending to it")
+    parser.add_argument("--pipeline-run", metavar="RESULTS", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.pipeline_run:
+        results = pipeline_benchmarks(args.workers)
+        with open(args.pipeline_run, "w") as f:
+            json.dump(results, f)
+        return
+
+    runs = {'dataset': None}
+    runs.update({f"{scale}x": scale for scale in args.scales})
+    all_results = {}
+    failed = []
+    for run, scale in runs.items():
+        print(f"Running {run}...", flush=True)
+        try:
+            all_results[run] = run_pipeline(scale, args.months, args.workers, args.runs, args.timeout)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            # Where it breaks is a result too
+            print(f"{run}: {e}")
+            failed.append(run)
+    all_results['round_trips'] = round_trip_benchmarks(args.latency)
+
+    history = read_history(args.history)
+    host = socket.gethostname()
+    settings = {'months': args.months, 'latency': args.latency, 'runs': args.runs, 'workers': args.workers}
+    for run, results in all_results.items():
+        print(run)
+        for name, value in results.items():
+            unit = "MB" if name.endswith("_mb") else "ms"
+            reference = baseline(history, host, settings, run, name)
+            if reference is None or name == 'dataset_mb':
+                status = ""
+            elif value > reference * args.threshold and value - reference > MIN_REGRESSION:
+                status = f"REGRESSION ({value / reference:.2f}x of {reference:.3g})"
+                failed.append(f"{run}/{name}")
+            else:
+                status = f"ok ({value / reference:.2f}x of {reference:.3g})"
+            # How each benchmark grows with the data, next to the 1x run
+            scaling = ""
+            if run.endswith("x") and run != "1x" and name in all_results.get("1x", {}) and all_results["1x"][name]:
+                scaling = f"{value / all_results['1x'][name]:.1f}x of 1x"
+            print(f"  {name:<22} {value:10.2f} {unit}  {scaling:<12} {status}")
+
+    if not args.no_record:
+        record = {
+            'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'commit': git_commit(),
+            'host': host,
+            'python': sys.version.split()[0],
+            'settings': settings,
+            'results': all_results,
+        }
+        with open(args.history, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    if failed:
+        print(f"Pipeline failures or regressions in: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import math
+
+import numpy as np
+
+from listing_ids import id_hex
+from market_cube import ALL_ROOMS
+from snapshot_store import load_columns, normalize_city, period_code
+
+BUDGET_COLUMNS = ['id', 'price', 'rooms', 'squareMeters']
+
+
+class BudgetIndex:
+    # Listings of one (kind, city) sorted by price within each (month, rooms) partition, so the listings
+    # inside a budget are one contiguous slice found with two binary searches. Every month also has an
+    # ALL_ROOMS partition holding all its listings, sorted by price.
+    def __init__(self, columns, partitions):
+        self.columns = columns
+        # (period, rooms) -> (start, end) row range in columns
+        self.partitions = partitions
+        self.periods = sorted({period for period, _ in partitions})
+
+    @classmethod
+    def build(cls, entries, city):
+        city = normalize_city(city)
+        blocks = {column: [] for column in BUDGET_COLUMNS + ['price_per_m2']}
+        partitions = {}
+        offset = 0
+        for entry in entries:
+            if city not in entry['cities']:
+                continue
+            arrays = load_columns(entry['kind'], entry['year'], entry['month'], city, BUDGET_COLUMNS)
+            prices = np.asarray(arrays['price'])
+            rooms = np.asarray(arrays['rooms'])
+            period = period_code(entry['year'], entry['month'])
+            # Sorted by rooms, then by price within each room count; then the whole month by price
+            by_rooms = np.lexsort((prices, rooms))
+            by_price = np.argsort(prices, kind='stable')
+            room_values, room_starts = np.unique(rooms[by_rooms], return_index=True)
+            room_ends = np.append(room_starts[1:], len(by_rooms))
+            for room_count, start, end in zip(room_values, room_starts, room_ends):
+                partitions[(period, int(room_count))] = (offset + int(start), offset + int(end))
+            partitions[(period, ALL_ROOMS)] = (offset + len(by_rooms), offset + 2 * len(by_rooms))
+            for column in BUDGET_COLUMNS:
+                values = np.asarray(arrays[column])
+                blocks[column].extend([values[by_rooms], values[by_price]])
+            # Precomputed so a query only takes medians
+            price_per_m2 = (prices / np.asarray(arrays['squareMeters'])).astype('float32')
+            blocks['price_per_m2'].extend([price_per_m2[by_rooms], price_per_m2[by_price]])
+            offset += 2 * len(by_rooms)
+        columns = {
+            column: np.concatenate(parts) if parts else np.empty(0)
+            for column, parts in blocks.items()
+        }
+        return cls(columns, partitions)
+
+    def query(self, min_budget=0, max_budget=None, rooms=ALL_ROOMS, period=None, n=5):
+        # Count, median area and price per m2 of the listings priced within [min_budget, max_budget]
+        # (no upper bound when max_budget is None) in one month (default: the latest), and n
+        # representative listings spread evenly over that price range
+        if period is None:
+            period = self.periods[-1] if self.periods else None
+        start, end = self.partitions.get((period, rooms), (0, 0))
+        prices = self.columns['price'][start:end]
+        low = start + int(np.searchsorted(prices, min_budget, side='left'))
+        high = end if max_budget is None else start + int(np.searchsorted(prices, max_budget, side='right'))
+        count = max(high - low, 0)
+        if count == 0:
+            return {'period': period, 'count': 0, 'median_square_meters': math.nan, 'median_price_per_m2': math.nan, 'listings': []}
+
+        # Evenly spaced ranks from the cheapest to the most expensive listing in the budget
+        k = min(n, count)
+        picks = sorted({low + round(i * (count - 1) / (k - 1)) for i in range(k)}) if k > 1 else [low] * k
+        return {
+            'period': period,
+            'count': count,
+            'median_square_meters': float(np.median(self.columns['squareMeters'][low:high])),
+            'median_price_per_m2': float(np.median(self.columns['price_per_m2'][low:high])),
+            'listings': [
+                {
+                    'id': id_hex(self.columns['id'][row]),
+                    'price': int(self.columns['price'][row]),
+                    'rooms': int(self.columns['rooms'][row]),
+                    'squareMeters': int(self.columns['squareMeters'][row]),
+                }
+                for row in picks
+            ],
+        }
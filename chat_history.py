@@ -0,0 +1,61 @@
+from prompt_builder import estimate_tokens
+
+DEFAULT_HISTORY_TOKEN_BUDGET = 1500
+SUMMARY_TOKEN_BUDGET = 200
+# Characters kept from each message when it is folded into the summary
+SUMMARY_SNIPPET_CHARS = 160
+
+
+def summarize_messages(previous_summary, messages):
+    # Cheap extractive summary: the opening of every rolled-off message, newest last.
+    # Only the most recent part is kept so the summary itself stays within SUMMARY_TOKEN_BUDGET.
+    lines = previous_summary.split("\n") if previous_summary else []
+    for message in messages:
+        text = " ".join(message["content"].split())
+        if len(text) > SUMMARY_SNIPPET_CHARS:
+            text = text[:SUMMARY_SNIPPET_CHARS].rsplit(" ", 1)[0] + "..."
+        lines.append(f"{message['role']}: {text}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > SUMMARY_TOKEN_BUDGET:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ConversationHistory:
+    # Keeps the full transcript for display, but sends the model only the newest turns that fit in
+    # token_budget; older turns are folded into a summary message that is updated incrementally
+    def __init__(self, token_budget=DEFAULT_HISTORY_TOKEN_BUDGET, summarizer=summarize_messages):
+        self.messages = []
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+        self.summary = ""
+        # Number of leading messages already folded into self.summary
+        self.summarized = 0
+
+    def append(self, role, content):
+        # The same turn may be reported by both the UI and the advisor; store it once
+        if self.messages and self.messages[-1] == {"role": role, "content": content}:
+            return
+        self.messages.append({"role": role, "content": content})
+
+    def context(self):
+        # Messages to send: an optional summary message followed by the newest turns within budget
+        budget = self.token_budget - SUMMARY_TOKEN_BUDGET
+        keep_from = len(self.messages)
+        used = 0
+        while keep_from > self.summarized:
+            cost = estimate_tokens(self.messages[keep_from - 1]["content"])
+            # The newest message always goes out, even if it is larger than the budget on its own
+            if used + cost > budget and keep_from < len(self.messages):
+                break
+            used += cost
+            keep_from -= 1
+
+        if keep_from > self.summarized:
+            self.summary = self.summarizer(self.summary, self.messages[self.summarized:keep_from])
+            self.summarized = keep_from
+
+        context = []
+        if self.summary:
+            context.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        context.extend(self.messages[keep_from:])
+        return context
@@ -0,0 +1,56 @@
+import re
+
+# 'Year,Month,Predicted Median Price' lines requested from the advisor, e.g. 2025,August,160000
+FORECAST_LINE_PATTERN = re.compile(r"(\d{4}),(\w+),(\d+(?:\.\d+)?)")
+
+
+def parse_forecast_line(line):
+    match = FORECAST_LINE_PATTERN.match(line.strip())
+    if match is None:
+        return None
+    year, month, price = match.groups()
+    return {"Year": int(year), "Month": month, "Predicted Median Price": float(price)}
+
+
+def parse_forecast_text(text):
+    rows = []
+    for line in text.split("\n"):
+        row = parse_forecast_line(line)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+class ForecastStreamParser:
+    # Collects forecast rows from a reply that arrives in arbitrary chunks; a line is only
+    # parsed once its newline has arrived, so a price is never read while still partial
+    def __init__(self):
+        self.buffer = ""
+        self.rows = []
+
+    def feed(self, chunk):
+        # Returns the rows completed by this chunk
+        self.buffer += chunk
+        *lines, self.buffer = self.buffer.split("\n")
+        new_rows = [row for row in map(parse_forecast_line, lines) if row is not None]
+        self.rows.extend(new_rows)
+        return new_rows
+
+    def close(self):
+        # The last line of a reply usually has no trailing newline
+        return self.feed("\n") if self.buffer else []
+
+
+def forecast_dataframe(rows):
+    # pandas is only imported once a chart is drawn; parsing replies does not need it
+    import pandas as pd
+    return pd.DataFrame(rows, columns=["Year", "Month", "Predicted Median Price"])
+
+
+def local_forecast_dataframe(rows):
+    # Rows from forecaster.forecast_prices, with a real date column for charting
+    import pandas as pd
+    df = pd.DataFrame(rows, columns=["Year", "Month", "Predicted Median Price", "Lower", "Upper"])
+    # astype(str) on both sides: with no rows (under three months of data) Month has no string dtype
+    df["Date"] = pd.to_datetime(df["Year"].astype(str) + " " + df["Month"].astype(str), format="%Y %B")
+    return df
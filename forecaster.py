@@ -0,0 +1,61 @@
+import calendar
+
+import numpy as np
+
+FORECAST_MONTHS = 36
+# Two-sided 95% band
+Z_95 = 1.96
+# Month-of-year effects need every calendar month observed at least twice to be told apart from trend
+MIN_MONTHS_FOR_SEASONALITY = 24
+
+
+def design_matrix(t, months_of_year, seasonal):
+    columns = [np.ones(len(t)), t.astype('float64')]
+    if seasonal:
+        # One dummy per calendar month except January, which is absorbed by the intercept
+        columns.extend((months_of_year == month).astype('float64') for month in range(2, 13))
+    return np.column_stack(columns)
+
+
+def forecast_prices(periods, medians, inflation, horizon=FORECAST_MONTHS):
+    # Fit log real (inflation-adjusted) median price = trend [+ month-of-year effects] by least squares,
+    # extrapolate it and re-inflate with the inflation MacroSeries. Returns one row per future month
+    # with a 95% band.
+    periods = np.asarray(periods, dtype='int64')
+    medians = np.asarray(medians, dtype='float64')
+    valid = ~np.isnan(medians) & (medians > 0)
+    periods, medians = periods[valid], medians[valid]
+    if len(periods) < 3:
+        return []
+
+    start = periods.min()
+    # Price level at every month since the first observation, relative to it
+    log_level = inflation.log_level(np.arange(start, periods.max() + horizon + 1)) - inflation.log_level(start)
+
+    t = periods - start
+    seasonal = t.max() + 1 >= MIN_MONTHS_FOR_SEASONALITY
+    x = design_matrix(t, periods % 12 + 1, seasonal)
+    y = np.log(medians) - log_level[t]
+    coefficients, _, rank, _ = np.linalg.lstsq(x, y, rcond=None)
+    residuals = y - x @ coefficients
+    degrees_of_freedom = max(len(y) - rank, 1)
+    sigma = np.sqrt(residuals @ residuals / degrees_of_freedom)
+    covariance = np.linalg.pinv(x.T @ x)
+
+    future_periods = np.arange(periods.max() + 1, periods.max() + horizon + 1)
+    future_t = future_periods - start
+    future_x = design_matrix(future_t, future_periods % 12 + 1, seasonal)
+    predicted = future_x @ coefficients + log_level[future_t]
+    standard_error = sigma * np.sqrt(1 + np.einsum('ij,jk,ik->i', future_x, covariance, future_x))
+
+    rows = []
+    for period, value, error in zip(future_periods, predicted, standard_error):
+        year, month = divmod(int(period), 12)
+        rows.append({
+            "Year": year,
+            "Month": calendar.month_name[month + 1],
+            "Predicted Median Price": float(np.exp(value)),
+            "Lower": float(np.exp(value - Z_95 * error)),
+            "Upper": float(np.exp(value + Z_95 * error)),
+        })
+    return rows
@@ -1,6 +1,16 @@
-import requests
-import time
+import hashlib
+import json
+import os
 import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limit import TokenBucket
 
 def send_request(url, headers):
     try:
@@ -31,8 +41,12 @@ def get_random_referer():
     ]
     return random.choice(referers)
 
+def build_url(base_url, params):
+    # Parameters are joined as-is because some values (roomsNumber) are already percent-encoded
+    return base_url + '?' + '&'.join([f"{key}={value}" for key, value in params.items()])
+
 def search_apartments(base_url, params):
-    url = base_url + '?' + '&'.join([f"{key}={value}" for key, value in params.items()])
+    url = build_url(base_url, params)
     headers = {
         'User-Agent': get_random_user_agent(),
         'Accept-Language': 'en-US,en;q=0.9',
@@ -42,35 +56,150 @@ def search_apartments(base_url, params):
     data = send_request(url, headers)
     return data
 
-def get_median_price(base_url, search_params):
-    # First request to get the total page count
-    data = search_apartments(base_url, search_params)
-    if data:
-        total_pages = data['pageProps']['data']['searchAds']['pagination']['totalPages']
-        print(f"Total pages: {total_pages}")
-
-        # Calculate the median page
-        median_page = (total_pages // 2) + 1
-        print(f"Median page: {median_page}")
-
-        # Modify search_params to go to the median page
-        search_params['page'] = median_page
-
-        # Wait for 10 seconds before making the second request
-        time.sleep(10)
-
-        # Second request to get the median page results
-        median_data = search_apartments(base_url, search_params)
-        
-        if median_data:
-            items = median_data['pageProps']['data']['searchAds']['items']
-            prices = [item['totalPrice']['value'] for item in items if 'totalPrice' in item and 'value' in item['totalPrice']]
-            average_price = sum(prices) / len(prices) if prices else 0
-            print(f"Average price on median page: {average_price} PLN")
-            return average_price
-        else:
-            print("Failed to retrieve data for the median page.")
+class PageCache:
+    # On-disk cache of page JSON; fresh entries are served without a request, stale ones are revalidated by ETag
+    def __init__(self, cache_dir, ttl):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode()).hexdigest() + ".json")
+
+    def get(self, url):
+        path = self.path(url)
+        if not os.path.exists(path):
             return None
-    else:
-        print("Failed to retrieve initial data.")
-        return None
\ No newline at end of file
+        with open(path) as f:
+            return json.load(f)
+
+    def is_fresh(self, entry):
+        return time.time() - entry['fetched_at'] < self.ttl
+
+    def set(self, url, data, etag):
+        entry = {'url': url, 'etag': etag, 'fetched_at': time.time(), 'data': data}
+        tmp_path = self.path(url) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self.path(url))
+        return entry
+
+def extract_prices(data):
+    items = data['pageProps']['data']['searchAds']['items']
+    return [item['totalPrice']['value'] for item in items if item.get('totalPrice') and 'value' in item['totalPrice']]
+
+def sample_pages(total_pages, count):
+    # Evenly spaced pages across the whole result set, always including the first and the last
+    if count >= total_pages:
+        return list(range(1, total_pages + 1))
+    if count <= 1:
+        return [1]
+    return sorted({1 + round(i * (total_pages - 1) / (count - 1)) for i in range(count)})
+
+# One limiter for every scraper in the process, so concurrent crawls share the request budget
+otodom_bucket = TokenBucket(rate=0.5, capacity=2)
+
+class OtodomScraper:
+    def __init__(self, base_url, search_params, sample_size=6, max_workers=3, bucket=None,
+                 cache_dir="dataset/scrape_cache", cache_ttl=3600, timeout=15):
+        self.base_url = base_url
+        self.search_params = dict(search_params)
+        self.sample_size = sample_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.bucket = bucket or otodom_bucket
+        self.cache = PageCache(cache_dir, cache_ttl)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Crawl state lives next to the page cache, keyed by the query without its page number
+        query = {key: value for key, value in self.search_params.items() if key != 'page'}
+        query_key = hashlib.sha1(build_url(base_url, query).encode()).hexdigest()
+        self.state_path = os.path.join(cache_dir, f"crawl_{query_key}.json")
+        self.state_lock = threading.Lock()
+
+    def headers(self, etag=None):
+        headers = {
+            'User-Agent': get_random_user_agent(),
+            'Accept-Language': 'en-US,en;q=0.9',
+            'Referer': get_random_referer(),
+            'Origin': get_random_referer()
+        }
+        if etag:
+            headers['If-None-Match'] = etag
+        return headers
+
+    def fetch_page(self, page):
+        url = build_url(self.base_url, dict(self.search_params, page=page))
+        cached = self.cache.get(url)
+        if cached is not None and self.cache.is_fresh(cached):
+            return cached['data']
+
+        self.bucket.acquire()
+        try:
+            response = self.session.get(url, headers=self.headers(cached['etag'] if cached else None), timeout=self.timeout)
+            if response.status_code == 304 and cached is not None:
+                return self.cache.set(url, cached['data'], cached['etag'])['data']
+            response.raise_for_status()
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error occurred while fetching page {page}: {e}")
+            # A stale copy is better than nothing
+            return cached['data'] if cached is not None else None
+        self.cache.set(url, data, response.headers.get('ETag'))
+        return data
+
+    def load_state(self):
+        state = None
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if time.time() - state['started_at'] >= self.cache.ttl:
+                state = None
+        return state or {'started_at': time.time(), 'total_pages': None, 'pages': {}}
+
+    def save_state(self, state):
+        with self.state_lock:
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+
+    def crawl(self):
+        # Collect prices from a sample of result pages; pages finished by an interrupted crawl are not fetched again
+        state = self.load_state()
+        if state['total_pages'] is None:
+            data = self.fetch_page(1)
+            if data is None:
+                print("Failed to retrieve initial data.")
+                return []
+            state['total_pages'] = data['pageProps']['data']['searchAds']['pagination']['totalPages']
+            state['pages']['1'] = extract_prices(data)
+            self.save_state(state)
+        print(f"Total pages: {state['total_pages']}")
+
+        pending = [page for page in sample_pages(state['total_pages'], self.sample_size) if str(page) not in state['pages']]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch_page, page): page for page in pending}
+            for future in as_completed(futures):
+                data = future.result()
+                if data is None:
+                    continue
+                with self.state_lock:
+                    state['pages'][str(futures[future])] = extract_prices(data)
+                self.save_state(state)
+
+        return [price for prices in state['pages'].values() for price in prices]
+
+def get_median_price(base_url, search_params, **scraper_options):
+    # Median of every price collected from an evenly spaced sample of result pages
+    prices = OtodomScraper(base_url, search_params, **scraper_options).crawl()
+    if not prices:
+        print("Failed to retrieve any prices.")
+        return None
+    median_price = statistics.median(prices)
+    print(f"Median price over {len(prices)} listings: {median_price} PLN")
+    return median_price
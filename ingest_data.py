@@ -0,0 +1,72 @@
+import argparse
+import time
+
+import pandas as pd
+
+from listing_history import ListingHistory
+from macro_series import INFLATION_CSV, ingest_series_csv
+from market_cube import month_aggregates
+from snapshot_store import (CATEGORICAL_COLUMNS, DATASET_DIR, NUMERIC_COLUMNS, discover_snapshots, ingest, load_frame,
+                            memory_report, snapshot_cities)
+
+# Builds everything the advisor reads from dataset/: the columnar snapshot store, the per-month
+# aggregates, the listing histories and the macro series (seeded from their CSVs; inflation.py adds
+# newer months). The apps and the API only read these; run this after adding or changing a snapshot,
+# and running processes merge the new months on their next request:
+#
+#     python ingest_data.py
+
+
+def build_derived(manifest):
+    # Idempotent: months and histories whose snapshots did not change are only read back
+    for key in sorted(manifest):
+        entry = manifest[key]
+        for city in entry['cities']:
+            month_aggregates(entry, city, save=True)
+    for kind in sorted({entry['kind'] for entry in manifest.values()}):
+        cities = {city for entry in manifest.values() if entry['kind'] == kind for city in entry['cities']}
+        for city in sorted(cities):
+            ListingHistory.for_manifest(manifest, kind, city, save=True)
+
+
+def print_memory_report(manifest):
+    # Every snapshot of a kind as one frame: read straight from the CSVs (with per-row year and month,
+    # as the app used to hold them) against the compact frame loaded from the store
+    columns = list(NUMERIC_COLUMNS) + CATEGORICAL_COLUMNS
+    for kind in sorted({entry['kind'] for entry in manifest.values()}):
+        entries = [manifest[key] for key in sorted(manifest) if manifest[key]['kind'] == kind]
+        raw = pd.concat(
+            [pd.read_csv(entry['source'], usecols=columns).assign(year=entry['year'], month=entry['month']) for entry in entries],
+            ignore_index=True,
+        )
+        raw_report = memory_report(raw)
+        compact_report = memory_report(load_frame(kind, columns, manifest=manifest))
+        print(f"{kind}: {compact_report['rows']} rows, {raw_report['total'] / 1e6:.1f} MB from CSV, "
+              f"{compact_report['total'] / 1e6:.1f} MB compact ({raw_report['total'] / compact_report['total']:.1f}x smaller)")
+        for column in raw_report['columns'].keys() | compact_report['columns'].keys():
+            before = raw_report['columns'].get(column, 0)
+            after = compact_report['columns'].get(column, 0)
+            print(f"  {column:<22} {before / 1e6:8.2f} MB -> {after / 1e6:8.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest new or changed snapshots and rebuild derived data.")
+    parser.add_argument("--dataset-dir", default=DATASET_DIR, help="directory holding apartments_*_YYYY_MM.csv")
+    parser.add_argument("--workers", type=int, default=None, help="processes converting snapshots in parallel (default: one per core)")
+    parser.add_argument("--cities", nargs="+", default=None, help="only keep these cities (default: all)")
+    parser.add_argument("--memory-report", action="store_true", help="compare frame memory from CSV and from the store")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    manifest = ingest(discover_snapshots(args.dataset_dir), cities=args.cities, workers=args.workers)
+    build_derived(manifest)
+    inflation_changed = ingest_series_csv('inflation', INFLATION_CSV)
+    if inflation_changed:
+        print(f"Inflation series: {inflation_changed} month(s) added or revised from {INFLATION_CSV}")
+    print(f"Store up to date: {len(manifest)} snapshots, {len(snapshot_cities(manifest))} cities in {time.monotonic() - started:.1f}s")
+    if args.memory_report:
+        print_memory_report(manifest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from listing_ids import ID_DTYPE
+from snapshot_store import NUMERIC_COLUMNS, PERIOD_DTYPE, STORE_DIR, load_columns, normalize_city, period_code, read_json, write_json
+
+HISTORY_DIR = os.path.join(STORE_DIR, "history")
+
+# Snapshots are monthly, so time on market is only known to the month
+DAYS_PER_MONTH = 30.44
+
+HISTORY_ARRAYS = ['ids', 'periods', 'prices', 'rooms', 'square_meters', 'first_seen', 'last_seen']
+
+
+def history_version(entries):
+    sha = hashlib.sha1()
+    for entry in entries:
+        # The store format is part of the version: a layout change rebuilds the table even if no snapshot changed
+        sha.update(f"{entry['year']}_{entry['month']:02d}:{entry['sha1']}:{entry.get('format')};".encode())
+    return sha.hexdigest()[:12]
+
+
+class ListingHistory:
+    # One row per unique listing id of a (kind, city): first/last snapshot seen and a compact
+    # listings x months price array (NaN where the listing was not in that month's snapshot)
+    def __init__(self, ids, periods, prices, rooms, square_meters, first_seen, last_seen):
+        self.ids = ids
+        self.periods = periods
+        self.prices = prices
+        self.rooms = rooms
+        self.square_meters = square_meters
+        # Column indices into periods
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+
+    @classmethod
+    def build(cls, entries, city):
+        # Hash-join every month's ids against the ids seen so far; entries must be in month order
+        city = normalize_city(city)
+        entries = [entry for entry in entries if city in entry['cities']]
+        index = pd.Index([], dtype=object)
+        rooms = np.empty(0, dtype=NUMERIC_COLUMNS['rooms'])
+        square_meters = np.empty(0, dtype=NUMERIC_COLUMNS['squareMeters'])
+        months = []
+        for entry in entries:
+            arrays = load_columns(entry['kind'], entry['year'], entry['month'], city, ['id', 'price', 'rooms', 'squareMeters'])
+            month_ids = pd.Index(np.asarray(arrays['id']), dtype=object)
+            # A listing repeated within one snapshot counts once, with its last row; get_indexer
+            # needs unique ids on both sides of the join
+            keep = ~month_ids.duplicated(keep='last')
+            if not keep.all():
+                month_ids = month_ids[keep]
+                arrays = {column: np.asarray(values)[keep] for column, values in arrays.items()}
+            rows = index.get_indexer(month_ids)
+            new = rows == -1
+            rows[new] = np.arange(len(index), len(index) + new.sum())
+            index = index.append(month_ids[new])
+            rooms = np.resize(rooms, len(index))
+            square_meters = np.resize(square_meters, len(index))
+            # The latest snapshot wins for attributes that may be corrected over time
+            rooms[rows] = arrays['rooms']
+            square_meters[rows] = arrays['squareMeters']
+            months.append((rows, np.asarray(arrays['price'], dtype='float32')))
+
+        periods = np.array([period_code(entry['year'], entry['month']) for entry in entries], dtype=PERIOD_DTYPE)
+        ids = np.array(index.to_numpy(), dtype=ID_DTYPE)
+        prices = np.full((len(index), len(months)), np.nan, dtype='float32')
+        if len(index) == 0:
+            # No partitions for this city (or nothing ingested yet); argmax has nothing to reduce
+            empty = np.empty(0, dtype='int16')
+            return cls(ids, periods, prices, rooms, square_meters, empty, empty)
+        for column, (rows, month_prices) in enumerate(months):
+            prices[rows, column] = month_prices
+        seen = ~np.isnan(prices)
+        first_seen = seen.argmax(axis=1).astype('int16')
+        last_seen = (len(months) - 1 - seen[:, ::-1].argmax(axis=1)).astype('int16')
+        return cls(ids, periods, prices, rooms, square_meters, first_seen, last_seen)
+
+    def save(self, directory, version):
+        os.makedirs(directory, exist_ok=True)
+        for name in HISTORY_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        write_json(os.path.join(directory, "meta.json"), {'version': version})
+
+    @classmethod
+    def load(cls, directory, version):
+        meta = read_json(os.path.join(directory, "meta.json"), None)
+        if meta is None or meta['version'] != version:
+            return None
+        return cls(*[np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r') for name in HISTORY_ARRAYS])
+
+    @classmethod
+    def for_manifest(cls, manifest, kind, city, save=False):
+        # Load the stored table, rebuilding it only when one of its snapshots changed; only the
+        # ingest command saves a rebuilt table
+        entries = [manifest[key] for key in sorted(manifest) if manifest[key]['kind'] == kind]
+        city = normalize_city(city)
+        entries = [entry for entry in entries if city in entry['cities']]
+        directory = os.path.join(HISTORY_DIR, kind, f"city={city}")
+        version = history_version(entries)
+        history = cls.load(directory, version)
+        if history is None:
+            history = cls.build(entries, city)
+            if save:
+                history.save(directory, version)
+        return history
+
+    def __len__(self):
+        return len(self.ids)
+
+    def latest_prices(self):
+        return self.prices[np.arange(len(self)), self.last_seen]
+
+    def days_on_market(self):
+        # Listings already present in the first snapshot are left-censored: their true age is longer
+        months = self.periods[self.last_seen] - self.periods[self.first_seen] + 1
+        return months * DAYS_PER_MONTH
+
+    def price_cuts(self):
+        # True for listings whose price dropped between two consecutive snapshots they appeared in
+        seen = ~np.isnan(self.prices)
+        columns = np.arange(self.prices.shape[1])
+        last_seen_column = np.maximum.accumulate(np.where(seen, columns, 0), axis=1)
+        filled = self.prices[np.arange(len(self))[:, None], last_seen_column]
+        previous = filled[:, :-1]
+        current = self.prices[:, 1:]
+        return (seen[:, 1:] & (current < previous)).any(axis=1)
+
+    def summary(self, rooms=None):
+        # Statistics over unique listings rather than listing-months
+        mask = np.ones(len(self), dtype=bool) if rooms is None else self.rooms == rooms
+        observed_twice = mask & ((~np.isnan(self.prices)).sum(axis=1) >= 2)
+        return {
+            'unique_listings': int(mask.sum()),
+            'median_price': float(np.median(self.latest_prices()[mask])) if mask.any() else float('nan'),
+            'median_days_on_market': float(np.median(self.days_on_market()[mask])) if mask.any() else float('nan'),
+            'price_cut_rate': float(self.price_cuts()[observed_twice].mean()) if observed_twice.any() else float('nan'),
+        }
@@ -0,0 +1,24 @@
+import numpy as np
+
+# Listing ids in the snapshots are 32 hex characters (a 128-bit hash); the store keeps their 16 raw bytes
+ID_BYTES = 16
+ID_DTYPE = f'S{ID_BYTES}'
+
+
+def pack_ids(hex_ids):
+    # One bytes.fromhex over the concatenated ids instead of one call per listing
+    hex_ids = list(hex_ids)
+    if any(len(listing_id) != 2 * ID_BYTES for listing_id in hex_ids):
+        raise ValueError(f"Listing ids must be {2 * ID_BYTES} hex characters")
+    return np.frombuffer(bytes.fromhex(''.join(hex_ids)), dtype=ID_DTYPE)
+
+
+def id_hex(raw):
+    # numpy drops trailing zero bytes when reading an 'S' element; pad them back before formatting
+    return bytes(raw).ljust(ID_BYTES, b'\0').hex()
+
+
+def id_keys(ids):
+    # The first 8 of the 16 id bytes as a uint64: hashable as a plain integer column in frames, and
+    # with ~10^5 listings per snapshot a collision is about a 1 in 10^9 event
+    return np.ascontiguousarray(ids, dtype=ID_DTYPE).view('<u8')[::2]
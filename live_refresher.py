@@ -0,0 +1,162 @@
+import math
+import threading
+import time
+from collections import Counter
+
+from html_parser import get_median_price
+
+OTODOM_BASE_URL = 'https://www.otodom.pl/_next/data/lG7lHcURBL6PPE-_9iij8/pl/wyniki/wynajem/mieszkanie/cala-polska.json'
+
+# Budgets are rounded outwards to bands of this width so nearby budgets share one live median
+BUDGET_BAND_WIDTH = 100000
+
+REFRESH_INTERVAL = 15 * 60
+# A combination whose fetch failed is not requested again for this long, doubling with every
+# further failure up to REFRESH_INTERVAL
+RETRY_BACKOFF = 30
+# How many of the most requested (rooms, budget band) combinations are kept warm
+POPULAR_COMBINATIONS = 8
+
+
+def budget_band(min_budget, max_budget, width=BUDGET_BAND_WIDTH):
+    low = math.floor(min_budget / width) * width
+    high = max(math.ceil(max_budget / width) * width, low + width)
+    return low, high
+
+
+def live_search_params(rooms, band):
+    return {
+        'distanceRadius': '75',
+        'limit': '36',
+        'ownerTypeSingleSelect': 'ALL',
+        'priceMin': str(band[0]),
+        'priceMax': str(band[1]),
+        'areaMin': '100',
+        'areaMax': '250',
+        'roomsNumber': f'%5B{rooms}%5D',
+        'by': 'PRICE',
+        'direction': 'DESC',
+        'viewType': 'listing',
+        'page': 1
+    }
+
+
+def fetch_live_median(key):
+    rooms, band = key
+    return get_median_price(OTODOM_BASE_URL, live_search_params(rooms, band))
+
+
+class LiveMedianStore:
+    # Latest live median per (rooms, budget band). A failed fetch never replaces the last good value.
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        # (value, age in seconds), or (None, None) if nothing has been collected yet
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None or entry['value'] is None:
+            return None, None
+        return entry['value'], time.time() - entry['updated_at']
+
+    def record_success(self, key, value):
+        with self.lock:
+            self.entries[key] = {'value': value, 'updated_at': time.time(), 'error': None, 'failures': 0, 'failed_at': None}
+
+    def record_failure(self, key, error):
+        with self.lock:
+            entry = self.entries.setdefault(
+                key, {'value': None, 'updated_at': None, 'error': None, 'failures': 0, 'failed_at': None}
+            )
+            entry['error'] = error
+            entry['failures'] += 1
+            entry['failed_at'] = time.monotonic()
+
+    def retry_in(self, key, backoff=RETRY_BACKOFF, limit=REFRESH_INTERVAL):
+        # Seconds until a failed combination may be fetched again; 0 if it has not failed
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or not entry['failures']:
+                return 0.0
+            delay = min(backoff * 2 ** (entry['failures'] - 1), limit)
+            return max(0.0, entry['failed_at'] + delay - time.monotonic())
+
+    def last_error(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+        return entry['error'] if entry else None
+
+
+class LiveMedianRefresher(threading.Thread):
+    # Collects live medians in the background so the Streamlit script only ever reads the store
+    def __init__(self, store, fetch=fetch_live_median, interval=REFRESH_INTERVAL, popular=POPULAR_COMBINATIONS):
+        super().__init__(name="live-median-refresher", daemon=True)
+        self.store = store
+        self.fetch = fetch
+        self.interval = interval
+        self.popular = popular
+        self.demand = Counter()
+        self.pending = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+
+    def request(self, key):
+        # Called by the UI on every rerun; a combination never collected before is fetched right away,
+        # unless its last fetch failed recently
+        with self.lock:
+            self.demand[key] += 1
+            if self.store.get(key)[0] is None and key not in self.pending and not self.store.retry_in(key):
+                self.pending.append(key)
+                self.wake.set()
+
+    def refresh(self, key):
+        try:
+            value = self.fetch(key)
+        except Exception as e:
+            # Any failure keeps the previous value; the refresher thread must not die
+            self.store.record_failure(key, str(e))
+            return
+        if value is None:
+            self.store.record_failure(key, "no prices collected")
+        else:
+            self.store.record_success(key, value)
+
+    def run(self):
+        next_full_refresh = 0
+        while not self.stopped.is_set():
+            with self.lock:
+                pending, self.pending = self.pending, []
+            for key in pending:
+                self.refresh(key)
+
+            if time.monotonic() >= next_full_refresh:
+                with self.lock:
+                    popular = [key for key, _ in self.demand.most_common(self.popular)]
+                for key in popular:
+                    if self.stopped.is_set():
+                        return
+                    self.refresh(key)
+                next_full_refresh = time.monotonic() + self.interval
+
+            self.wake.wait(timeout=max(0.0, next_full_refresh - time.monotonic()))
+            self.wake.clear()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+
+
+_default_refresher = None
+_default_refresher_lock = threading.Lock()
+
+
+def get_live_refresher():
+    # Started once per process; Streamlit keeps this module imported across reruns and sessions
+    global _default_refresher
+    with _default_refresher_lock:
+        if _default_refresher is None:
+            _default_refresher = LiveMedianRefresher(LiveMedianStore())
+            _default_refresher.start()
+        return _default_refresher
@@ -0,0 +1,178 @@
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from llm_stream import iter_stream_deltas
+
+API_ENDPOINT = "https://api.openai.com/v1/chat/completions"
+
+# Rate limiting and transient server errors are retried; anything else fails immediately
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def retry_after_seconds(response):
+    # Retry-After is either a number of seconds or an HTTP date
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class LLMClient:
+    # Chat completion transport: one keep-alive connection pool per process, bounded concurrency,
+    # per-request timeouts and jittered exponential backoff that honours Retry-After
+    def __init__(self, api_endpoint=API_ENDPOINT, api_key=None, timeout=(5, 120), max_retries=5,
+                 backoff_base=1.0, backoff_cap=30.0, max_concurrency=8, pool_size=16, verify=True):
+        self.api_endpoint = api_endpoint
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_concurrency = max_concurrency
+        self.verify = verify
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # One limit for sync and async callers alike
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def headers(self):
+        api_key = self.api_key or os.getenv("OPENAI_API_KEY")
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+        }
+
+    def backoff_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = retry_after_seconds(response)
+            if retry_after is not None:
+                return min(retry_after, self.backoff_cap)
+        # Full jitter keeps many workers that were throttled together from retrying in lockstep
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def attempt(self, api_request, attempt, stream=False):
+        # One HTTP attempt. Returns (response, None) on success or (None, delay) when it should be
+        # retried after delay seconds; raises LLMError when it should not be retried
+        last_attempt = attempt >= self.max_retries - 1
+        try:
+            response = self.session.post(self.api_endpoint, json=api_request, headers=self.headers(),
+                                         timeout=self.timeout, verify=self.verify, stream=stream)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if last_attempt:
+                raise LLMError(str(e)) from e
+            return None, self.backoff_delay(attempt)
+
+        if response.status_code in RETRY_STATUS_CODES and not last_attempt:
+            delay = self.backoff_delay(attempt, response)
+            response.close()
+            return None, delay
+
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            response.close()
+            raise LLMError(str(e), response.status_code) from e
+        return response, None
+
+    def post(self, api_request, stream=False):
+        for attempt in range(self.max_retries):
+            response, delay = self.attempt(api_request, attempt, stream)
+            if response is not None:
+                return response
+            print(f"LLM request failed, retrying in {delay:.1f} seconds.")
+            time.sleep(delay)
+        raise LLMError("Maximum retry attempts exceeded.")
+
+    def complete(self, api_request):
+        with self.semaphore:
+            response = self.post(api_request)
+            try:
+                response_data = response.json()
+            except ValueError as e:
+                raise LLMError(f"Invalid response body: {e}") from e
+        return response_data['choices'][0]['message']['content']
+
+    def stream(self, api_request):
+        # The concurrency slot is held until the whole reply has been read
+        with self.semaphore:
+            with self.post(dict(api_request, stream=True), stream=True) as response:
+                try:
+                    yield from iter_stream_deltas(response.iter_lines(decode_unicode=True))
+                except requests.exceptions.RequestException as e:
+                    raise LLMError(str(e)) from e
+                except ValueError as e:
+                    # Malformed event data; callers only have to handle LLMError
+                    raise LLMError(f"Invalid stream chunk: {e}") from e
+
+    async def acquire_async(self):
+        # Takes a slot of the shared semaphore without blocking the event loop; a slot acquired for a
+        # task that was cancelled while waiting is handed straight back
+        if self.semaphore.acquire(blocking=False):
+            return
+        acquire = asyncio.ensure_future(asyncio.to_thread(self.semaphore.acquire))
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            acquire.add_done_callback(lambda _: self.semaphore.release())
+            raise
+
+    async def acomplete(self, api_request):
+        # asyncio variant: HTTP calls run in worker threads over the same pool, and backoff
+        # sleeps with asyncio.sleep so the event loop is never blocked
+        await self.acquire_async()
+        try:
+            for attempt in range(self.max_retries):
+                response, delay = await asyncio.to_thread(self.attempt, api_request, attempt)
+                if response is not None:
+                    try:
+                        response_data = response.json()
+                    except ValueError as e:
+                        raise LLMError(f"Invalid response body: {e}") from e
+                    return response_data['choices'][0]['message']['content']
+                print(f"LLM request failed, retrying in {delay:.1f} seconds.")
+                await asyncio.sleep(delay)
+        finally:
+            self.semaphore.release()
+        raise LLMError("Maximum retry attempts exceeded.")
+
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    # Created once per process so every Streamlit session reuses the same connection pool. Always the
+    # default configuration (TLS verified); callers that need other settings build their own LLMClient.
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = LLMClient()
+        return _default_client
@@ -0,0 +1,22 @@
+import json
+
+
+def iter_stream_deltas(lines):
+    # Yield the text deltas of an OpenAI-style server-sent-event stream of chat completion chunks;
+    # raises ValueError for a data line that is not a JSON chunk
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line or not line.startswith('data:'):
+            # Blank keep-alive lines, comments and other SSE fields carry no content
+            continue
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            return
+        chunk = json.loads(data)
+        if not isinstance(chunk, dict):
+            raise ValueError(f"Unexpected stream chunk: {data[:100]}")
+        for choice in chunk.get('choices') or []:
+            content = (choice.get('delta') or {}).get('content')
+            if content:
+                yield content
@@ -0,0 +1,153 @@
+import csv
+import hashlib
+import os
+
+import numpy as np
+
+from snapshot_store import DATASET_DIR, PERIOD_DTYPE, STORE_DIR, file_hash, period_code, read_json, write_json
+
+# Monthly macro series (inflation now; rates or wages later), one small array file per series.
+# ingest_data.py seeds them from CSVs in dataset/ and scrapers such as inflation.py upsert newer months.
+MACRO_DIR = os.path.join(STORE_DIR, "macro")
+SOURCES_PATH = os.path.join(MACRO_DIR, "sources.json")
+
+# Seeds the 'inflation' series (y/y CPI in %)
+INFLATION_CSV = os.path.join(DATASET_DIR, "poland_inflation_rates_oecd.csv")
+
+SERIES_DTYPE = np.dtype([('period', PERIOD_DTYPE), ('value', 'float64')])
+
+
+def period_label(code):
+    # 24281 -> '2023-06', the month format of the macro CSVs
+    year, month = divmod(int(code), 12)
+    return f"{year}-{month + 1:02d}"
+
+
+def parse_period(label):
+    # '2023-06' (or '2023-06-01') -> period code
+    year, month = label.strip().split('-')[:2]
+    return period_code(int(year), int(month))
+
+
+class MacroSeries:
+    # One monthly series as sorted period codes and values, e.g. y/y CPI inflation in %. A value holds
+    # from its month until the next observation; before the first and after the last it carries on flat.
+    def __init__(self, periods, values):
+        self.periods = np.asarray(periods, dtype='int64')
+        self.values = np.asarray(values, dtype='float64')
+        if len(self.periods) == 0:
+            raise ValueError("A macro series needs at least one observation")
+        # Log price level at every month from the first observation to the last (0 at the first), so
+        # cumulative inflation between two months is a difference of two lookups
+        self.steps = np.log1p(self.as_of(np.arange(self.periods[0], self.periods[-1] + 1)) / 100) / 12
+        self.levels = np.cumsum(self.steps) - self.steps[0]
+        # Changes whenever an observation does; used to key caches built on the series
+        self.version = hashlib.sha1(self.periods.tobytes() + self.values.tobytes()).hexdigest()[:12]
+
+    @classmethod
+    def from_observations(cls, periods, values):
+        # Sorted and de-duplicated; of repeated months the last observation wins
+        periods = np.asarray(periods, dtype='int64')[::-1]
+        values = np.asarray(values, dtype='float64')[::-1]
+        unique, first = np.unique(periods, return_index=True)
+        return cls(unique, values[first])
+
+    def __len__(self):
+        return len(self.periods)
+
+    def upsert(self, periods, values):
+        # A new series with these months added or replaced
+        return MacroSeries.from_observations(np.append(self.periods, periods), np.append(self.values, values))
+
+    def as_of(self, periods):
+        # Value in force in each period, vectorised over an array of period codes
+        positions = np.searchsorted(self.periods, periods, side='right') - 1
+        return self.values[np.clip(positions, 0, len(self.values) - 1)]
+
+    def log_level(self, periods):
+        # Log price level implied by the y/y rates, relative to the first observed month
+        periods = np.asarray(periods, dtype='int64')
+        first, last = self.periods[0], self.periods[-1]
+        inside = np.clip(periods, first, last)
+        # Outside the series the first or last monthly step repeats
+        outside_step = np.where(periods > last, self.steps[-1], self.steps[0])
+        return self.levels[inside - first] + (periods - inside) * outside_step
+
+    def cumulative_inflation(self, from_periods, to_periods):
+        # Price growth in % from each from-period to the matching to-period (negative going back in time)
+        return np.expm1(self.log_level(to_periods) - self.log_level(from_periods)) * 100
+
+    def deflate(self, prices, periods, base_period):
+        # Prices observed in each period expressed in base_period money, in one vectorised step
+        return np.asarray(prices, dtype='float64') * np.exp(self.log_level(base_period) - self.log_level(periods))
+
+    def to_dict(self):
+        # {'2023-06': value, ...}, oldest first
+        return {period_label(code): float(value) for code, value in zip(self.periods, self.values)}
+
+
+def series_path(name):
+    return os.path.join(MACRO_DIR, f"{name}.npy")
+
+
+def series_version(name):
+    # Changes whenever the stored series is rewritten; None until it exists
+    path = series_path(name)
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+
+def load_series(name):
+    # The stored series, or None if nothing was ingested or scraped for it yet
+    path = series_path(name)
+    if not os.path.exists(path):
+        return None
+    records = np.load(path)
+    return MacroSeries(records['period'], records['value'])
+
+
+def save_series(name, series):
+    records = np.empty(len(series), dtype=SERIES_DTYPE)
+    records['period'] = series.periods
+    records['value'] = series.values
+    os.makedirs(MACRO_DIR, exist_ok=True)
+    # Write to a temporary file first so readers never see a half-written series
+    tmp_path = series_path(name) + ".tmp.npy"
+    np.save(tmp_path, records)
+    os.replace(tmp_path, series_path(name))
+
+
+def upsert_series(name, periods, values):
+    # Add or replace months of a stored series; returns the series and how many months changed
+    current = load_series(name)
+    if current is None:
+        series = MacroSeries.from_observations(periods, values)
+        changed = len(series)
+    else:
+        series = current.upsert(periods, values)
+        changed = int(np.count_nonzero(
+            ~np.isin(series.periods, current.periods) | (series.values != current.as_of(series.periods))
+        ))
+    if changed:
+        save_series(name, series)
+    return series, changed
+
+
+def read_series_csv(path, value_column='Rate'):
+    # A 'Date,<value_column>' CSV with one row per month (Date as YYYY-MM) as a series
+    with open(path, newline='') as f:
+        rows = [(parse_period(row['Date']), float(row[value_column])) for row in csv.DictReader(f)]
+    return MacroSeries.from_observations([period for period, _ in rows], [value for _, value in rows])
+
+
+def ingest_series_csv(name, path, value_column='Rate'):
+    # Upsert a CSV into the store when the file changed since it was last ingested, so re-running the
+    # ingest does not overwrite newer scraped months with the same CSV rows; returns months changed
+    sources = read_json(SOURCES_PATH, {})
+    sha1 = file_hash(path)
+    if sources.get(path) == sha1 and load_series(name) is not None:
+        return 0
+    csv_series = read_series_csv(path, value_column)
+    _, changed = upsert_series(name, csv_series.periods, csv_series.values)
+    sources[path] = sha1
+    write_json(SOURCES_PATH, sources)
+    return changed
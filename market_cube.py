@@ -0,0 +1,174 @@
+import bisect
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from quantile_sketch import TDigest, merge_moments, moments, moments_std
+from snapshot_store import load_snapshot_frame, normalize_city, partition_dir, period_code, read_json, write_json
+
+# Lookups with rooms=ALL_ROOMS aggregate over every room count
+ALL_ROOMS = None
+
+QUANTILES = [0.25, 0.5, 0.75]
+QUANTILE_NAMES = ['q25', 'median', 'q75']
+
+# Bumped whenever the cached per-month aggregate layout changes, so old caches are rebuilt
+AGGREGATES_FORMAT = 2
+
+
+def aggregate(df, group_columns):
+    # One grouped pass over the listings: count, std, quartiles and median price per m2 per group
+    df = df.assign(price_per_m2=df['price'] / df['squareMeters'])
+    grouped = df.groupby(group_columns)
+    stats = grouped['price'].agg(['count', 'std'])
+    quantiles = grouped['price'].quantile(QUANTILES).unstack()
+    quantiles.columns = QUANTILE_NAMES
+    stats['median_price_per_m2'] = grouped['price_per_m2'].median()
+    return stats.join(quantiles)
+
+
+def summarize_prices(prices):
+    # Mergeable part of a cell: exact count/sum/sum of squares plus a t-digest of the prices
+    return dict(moments(prices), sketch=TDigest.from_values(prices).to_dict())
+
+
+def month_cells(df):
+    # [(rooms, stats), ...] for a single month of listings, including the all-rooms cell
+    if df.empty:
+        return []
+    cells = []
+    by_rooms = aggregate(df, ['rooms']).to_dict('index')
+    for rooms, prices in df.groupby('rooms')['price']:
+        cells.append((int(rooms), dict(by_rooms[rooms], **summarize_prices(prices))))
+    for stats in aggregate(df, ['period']).to_dict('index').values():
+        cells.append((ALL_ROOMS, dict(stats, **summarize_prices(df['price']))))
+    return cells
+
+
+def month_aggregates(entry, city, save=False):
+    # Per-month aggregates are cached next to the snapshot columns and reused until its source changes.
+    # Only the ingest command saves them; serving code computes a missing month in memory.
+    if city not in entry['cities']:
+        return []
+    path = os.path.join(partition_dir(entry['kind'], entry['year'], entry['month'], city), "aggregates.json")
+    cached = read_json(path, None)
+    if cached is not None and cached['sha1'] == entry['sha1'] and cached.get('format') == AGGREGATES_FORMAT:
+        return [(rooms, stats) for rooms, stats in cached['cells']]
+
+    df = load_snapshot_frame(entry, ['price', 'rooms', 'squareMeters'], city)
+    cells = month_cells(df)
+    if save:
+        write_json(path, {'sha1': entry['sha1'], 'format': AGGREGATES_FORMAT, 'cells': cells})
+    return cells
+
+
+class MarketCube:
+    def __init__(self, city):
+        self.city = normalize_city(city)
+        # (kind, year, month, rooms) -> stats dict
+        self.cells = {}
+        # kind -> sorted list of (year, month) present in the cube
+        self.periods = {}
+        # (kind, year, month) -> (source sha1, room keys stored for that month)
+        self.versions = {}
+        # Changes whenever a month is added or replaced; used to key caches built on the cube
+        self.version = self.compute_version()
+
+    @classmethod
+    def from_manifest(cls, manifest, city):
+        cube = cls(city)
+        for key in sorted(manifest):
+            cube.add_snapshot(manifest[key])
+        return cube
+
+    def add_snapshot(self, entry):
+        # Merge one snapshot's month into the cube; returns False if that version is already present
+        kind, year, month = entry['kind'], entry['year'], entry['month']
+        version = self.versions.get((kind, year, month))
+        if version is not None and version[0] == entry['sha1']:
+            return False
+        if version is not None:
+            for rooms in version[1]:
+                del self.cells[(kind, year, month, rooms)]
+
+        cells = month_aggregates(entry, self.city)
+        for rooms, stats in cells:
+            self.cells[(kind, year, month, rooms)] = stats
+        self.versions[(kind, year, month)] = (entry['sha1'], [rooms for rooms, _ in cells])
+
+        periods = self.periods.setdefault(kind, [])
+        if cells and (year, month) not in periods:
+            bisect.insort(periods, (year, month))
+        elif not cells and (year, month) in periods:
+            periods.remove((year, month))
+        self.version = self.compute_version()
+        return True
+
+    def compute_version(self):
+        sha = hashlib.sha1()
+        for (kind, year, month), (source_sha1, _) in sorted(self.versions.items()):
+            sha.update(f"{kind}/{year}_{month:02d}:{source_sha1};".encode())
+        return sha.hexdigest()[:12]
+
+    def months(self, kind):
+        return self.periods.get(kind, [])
+
+    def lookup(self, kind, year, month, rooms=ALL_ROOMS):
+        return self.cells.get((kind, year, month, rooms))
+
+    def stat_array(self, name):
+        # One statistic of every cell as ([(kind, year, month, rooms), ...], period codes, values), for
+        # vectorised work across the whole cube
+        keys = list(self.cells)
+        periods = np.array([period_code(year, month) for _, year, month, _ in keys], dtype='int64')
+        values = np.array([self.cells[key][name] for key in keys], dtype='float64')
+        return keys, periods, values
+
+    def merged_stats(self, kind, periods=None, rooms=ALL_ROOMS):
+        # Count, mean, std and quantiles over any set of months and room counts, answered by merging
+        # the per-cell sketches and moments; periods=None means every month of this kind
+        if periods is None:
+            periods = self.months(kind)
+        room_keys = [ALL_ROOMS] if rooms is ALL_ROOMS else list(rooms)
+        cells = [
+            self.cells[(kind, year, month, room_key)]
+            for year, month in periods
+            for room_key in room_keys
+            if (kind, year, month, room_key) in self.cells
+        ]
+        merged = merge_moments(cells)
+        digest = TDigest.merge_all([TDigest.from_dict(cell['sketch']) for cell in cells])
+        stats = {
+            'count': merged['count'],
+            'mean': merged['sum'] / merged['count'] if merged['count'] else float('nan'),
+            'std': moments_std(merged),
+        }
+        for q, name in zip(QUANTILES, QUANTILE_NAMES):
+            stats[name] = digest.quantile(q)
+        return stats
+
+
+def sketch_error_report(df, group_columns=('rooms',), quantiles=QUANTILES):
+    # Sketch quantiles against exact pandas quantiles for every group of a listing frame
+    rows = []
+    for group, prices in df.groupby(list(group_columns))['price']:
+        digest = TDigest.from_values(prices)
+        for q in quantiles:
+            exact = prices.quantile(q)
+            estimate = digest.quantile(q)
+            # Share of prices strictly below and at or below the estimate; with tied prices any q
+            # between the two is a correct rank
+            below = (prices < estimate).mean()
+            at_or_below = (prices <= estimate).mean()
+            rows.append({
+                'group': group,
+                'quantile': q,
+                'exact': exact,
+                'sketch': estimate,
+                'relative_error': abs(estimate - exact) / exact if exact else float('nan'),
+                # How far the estimate is from the exact value, in quantile (rank) terms
+                'rank_error': max(0.0, below - q, q - at_or_below),
+            })
+    return pd.DataFrame(rows)
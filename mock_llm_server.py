@@ -0,0 +1,76 @@
+import json
+import time
+
+from mock_server import MockHandler, MockServer, run_server
+
+# Local stand-in for the chat completions endpoint, so the LLM transport can be exercised offline:
+#
+#     with run_mock_llm_server(reply="2025,August,160000", failures=[429]) as server:
+#         LLMClient(api_endpoint=server.url).complete(api_request)
+
+
+class MockLLMServer(MockServer):
+    url_path = "/v1/chat/completions"
+
+    def __init__(self, address, reply, failures, retry_after, latency, chunk_size, extra_events):
+        super().__init__(address, MockLLMHandler, latency)
+        self.reply = reply
+        # Status codes returned, in order, before the server starts answering normally
+        self.failures = list(failures)
+        self.retry_after = retry_after
+        self.chunk_size = chunk_size
+        # Raw lines streamed after the reply, e.g. a malformed event
+        self.extra_events = list(extra_events)
+
+
+class MockLLMHandler(MockHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with server.lock:
+            server.requests.append(body)
+            failure = server.failures.pop(0) if server.failures else None
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if failure is not None:
+            payload = json.dumps({"error": {"message": f"mock failure {failure}"}}).encode()
+            self.send_response(failure)
+            if server.retry_after is not None:
+                self.send_header("Retry-After", str(server.retry_after))
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        if body.get("stream"):
+            self.send_stream(server.reply, server.chunk_size, server.extra_events)
+        else:
+            payload = json.dumps({
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": server.reply}, "finish_reason": "stop"}],
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    def send_stream(self, reply, chunk_size, extra_events):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for start in range(0, len(reply), chunk_size):
+            chunk = {"choices": [{"index": 0, "delta": {"content": reply[start:start + chunk_size]}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        for event in extra_events:
+            self.wfile.write(f"{event}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+def run_mock_llm_server(reply="", failures=(), retry_after=None, latency=0.0, chunk_size=8, extra_events=()):
+    return run_server(MockLLMServer(("127.0.0.1", 0), reply, failures, retry_after, latency, chunk_size, extra_events))
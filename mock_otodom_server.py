@@ -0,0 +1,86 @@
+import glob
+import hashlib
+import json
+import os
+import time
+from urllib.parse import parse_qs, urlparse
+
+from mock_server import MockHandler, MockServer, run_server
+
+# Local stand-in for otodom's _next/data search endpoint. It replays recorded page JSON by the
+# `page` query parameter, honours If-None-Match with 304s and can inject latency:
+#
+#     with run_mock_otodom_server(load_recordings("recordings/")) as server:
+#         get_median_price(server.url, search_params, cache_dir=tmp_dir)
+
+
+def load_recordings(directory):
+    # page_<n>.json files saved from real _next/data responses
+    pages = {}
+    for path in glob.glob(os.path.join(directory, "page_*.json")):
+        page = int(os.path.basename(path)[len("page_"):-len(".json")])
+        with open(path) as f:
+            pages[page] = json.load(f)
+    return pages
+
+
+def synthetic_page(total_pages, prices):
+    # The subset of the _next/data shape that html_parser reads
+    return {
+        "pageProps": {
+            "data": {
+                "searchAds": {
+                    "pagination": {"totalPages": total_pages},
+                    "items": [{"totalPrice": {"value": price, "currency": "PLN"}} for price in prices],
+                }
+            }
+        }
+    }
+
+
+class MockOtodomServer(MockServer):
+    url_path = "/_next/data/mock/pl/wyniki/wynajem/mieszkanie/cala-polska.json"
+
+    def __init__(self, address, pages, latency):
+        super().__init__(address, MockOtodomHandler, latency)
+        self.pages = pages
+        # Pages answered with 304 Not Modified
+        self.not_modified = []
+
+
+class MockOtodomHandler(MockHandler):
+    def do_GET(self):
+        server = self.server
+        page = int(parse_qs(urlparse(self.path).query).get("page", ["1"])[0])
+        with server.lock:
+            server.requests.append(page)
+        if server.latency:
+            time.sleep(server.latency)
+
+        if page not in server.pages:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        payload = json.dumps(server.pages[page]).encode()
+        etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            with server.lock:
+                server.not_modified.append(page)
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def run_mock_otodom_server(pages, latency=0.0):
+    return run_server(MockOtodomServer(("127.0.0.1", 0), pages, latency))
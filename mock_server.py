@@ -0,0 +1,45 @@
+import contextlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Shared plumbing of the local stand-ins for outside services (mock_llm_server.py, mock_otodom_server.py)
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Path the mock answers on, appended to the bound host and port
+    url_path = "/"
+
+    def __init__(self, address, handler, latency):
+        super().__init__(address, handler)
+        self.latency = latency
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{self.url_path}"
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, keep-alive clients wait ~40 ms for a
+    # delayed ACK before the body arrives, which would swamp the latency being injected or measured
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def run_server(server):
+    # Serve from a background thread for the duration of the block
+    # A short poll interval so shutdown returns quickly when tests start and stop many servers
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -1,119 +1,255 @@
-import pandas as pd
 import os
+import threading
 
-sale_file_paths = [
-    "dataset/apartments_pl_2023_08.csv",
-    "dataset/apartments_pl_2023_09.csv",
-    "dataset/apartments_pl_2023_10.csv",
-    "dataset/apartments_pl_2023_11.csv",
-    "dataset/apartments_pl_2023_12.csv",
-    "dataset/apartments_pl_2024_01.csv",
-    "dataset/apartments_pl_2024_02.csv",
-    "dataset/apartments_pl_2024_04.csv",
-    "dataset/apartments_pl_2024_05.csv",
-    "dataset/apartments_pl_2024_06.csv"
-]
-
-rent_file_paths = [
-    "dataset/apartments_rent_pl_2023_11.csv",
-    "dataset/apartments_rent_pl_2023_12.csv",
-    "dataset/apartments_rent_pl_2024_01.csv",
-    "dataset/apartments_rent_pl_2024_02.csv",
-    "dataset/apartments_rent_pl_2024_03.csv",
-    "dataset/apartments_rent_pl_2024_04.csv",
-    "dataset/apartments_rent_pl_2024_05.csv",
-    "dataset/apartments_rent_pl_2024_06.csv"
-]
-
-sale_dfs = []
-rent_dfs = []
-
-for path in sale_file_paths:
-    if os.path.exists(path):
-        df = pd.read_csv(path)
-        df = df[df['city'] == 'warszawa']  # Filter data for Warszawa only
-        df = df[['id', 'price', 'rooms', 'squareMeters']]  # Select desired columns
-        
-        # Round square meters to the nearest integer
-        df['squareMeters'] = df['squareMeters'].round().astype(int)
-        
-        # Extract year and month from the file name
-        file_name = os.path.basename(path).split('.')[0]  # Remove the file extension
-        year, month = map(int, file_name.split('_')[2:4])
-        df['year'] = year  # Add the 'year' column
-        df['month'] = month  # Add the 'month' column
-        
-        sale_dfs.append(df)
-    else:
-        print(f"File not found: {path}")
-
-for path in rent_file_paths:
-    if os.path.exists(path):
-        df = pd.read_csv(path)
-        df = df[df['city'] == 'warszawa']  # Filter data for Warszawa only
-        df = df[['id', 'price', 'rooms', 'squareMeters']]  # Select desired columns
-        
-        # Round square meters to the nearest integer
-        df['squareMeters'] = df['squareMeters'].round().astype(int)
-        
-        # Extract year and month from the file name
-        file_name = os.path.basename(path).split('.')[0]  # Remove the file extension
-        year, month = map(int, file_name.split('_')[3:5])
-        df['year'] = year  # Add the 'year' column
-        df['month'] = month  # Add the 'month' column
-        
-        rent_dfs.append(df)
-    else:
-        print(f"File not found: {path}")
-
-# Concatenate and save the data for sale and rent separately
-if sale_dfs:
-    sale_data = pd.concat(sale_dfs)
-    sale_data.to_csv("dataset/sale_data.csv", index=False)
-    print("Sale data saved to dataset/sale_data.csv")
-else:
-    print("No sale data found.")
-
-if rent_dfs:
-    rent_data = pd.concat(rent_dfs)
-    rent_data.to_csv("dataset/rent_data.csv", index=False)
-    print("Rent data saved to dataset/rent_data.csv")
-else:
-    print("No rent data found.")
-
-def get_market_data(number_of_rooms):
-    # Calculate and return median prices and standard deviation by room number and square meters for each year and month
+from budget_index import BudgetIndex
+from forecaster import forecast_prices
+from listing_history import ListingHistory, history_version
+from macro_series import INFLATION_CSV, load_series, read_series_csv, series_version
+from market_cache import market_data_cache
+from market_cube import ALL_ROOMS, MarketCube
+from rental_yield import ALL_SIZES, SIZE_BANDS, yield_lookup, yield_matrix
+from snapshot_store import MANIFEST_PATH, discover_snapshots, latest_snapshot, load_frame, load_manifest, load_spatial_index, normalize_city, pending_snapshots, period_code, snapshot_cities
+
+DEFAULT_CITY = 'warszawa'
+
+# The columnar store is written only by `python ingest_data.py`; serving code reads its manifest on first use
+manifest = None
+# Modification time of the manifest file it was read from; a newer file means an ingest ran since
+manifest_mtime = None
+manifest_lock = threading.Lock()
+
+def manifest_file_mtime():
+    return os.stat(MANIFEST_PATH).st_mtime_ns if os.path.exists(MANIFEST_PATH) else None
+
+def get_manifest():
+    # Checked on every call, so running apps and API workers pick up an ingest on their next request
+    global manifest, manifest_mtime
+    mtime = manifest_file_mtime()
+    with manifest_lock:
+        if manifest is None:
+            manifest, manifest_mtime = load_manifest(), mtime
+            stale = pending_snapshots(discover_snapshots(), manifest)
+            if stale:
+                print(f"{len(stale)} snapshot(s) are new or changed but not ingested; run `python ingest_data.py` to add them")
+            return manifest
+        if mtime == manifest_mtime:
+            return manifest
+    refresh_market_data()
+    return manifest
+
+# One cube per city, built on first use from that city's partitions only
+market_cubes = {}
+market_cubes_lock = threading.Lock()
+
+class UnknownCityError(ValueError):
+    # A city with no ingested partitions; raised before anything is built or cached for it
+    def __init__(self, city):
+        super().__init__(f"No market data for city '{city}'")
+        self.city = city
+
+def available_cities():
+    return snapshot_cities(get_manifest())
+
+def get_market_cube(city=DEFAULT_CITY):
+    city = normalize_city(city)
+    # Outside the cubes lock: a changed manifest is merged into every loaded cube under that lock
+    current = get_manifest()
+    if city not in snapshot_cities(current):
+        # Otherwise any string a client sends would get its own cube for the life of the process
+        raise UnknownCityError(city)
+    with market_cubes_lock:
+        if city not in market_cubes:
+            market_cubes[city] = MarketCube.from_manifest(current, city)
+        return market_cubes[city]
+
+def refresh_market_data():
+    # Reload the manifest after `python ingest_data.py` ran and merge new or changed months into the loaded cubes
+    global manifest, manifest_mtime
+    mtime = manifest_file_mtime()
+    current = load_manifest()
+    with manifest_lock:
+        manifest, manifest_mtime = current, mtime
+    merged = []
+    with market_cubes_lock:
+        cubes = list(market_cubes.values())
+    for key in sorted(current):
+        # Every cube has to see every snapshot, so no short-circuiting here
+        if [cube.add_snapshot(current[key]) for cube in cubes].count(True):
+            merged.append(key)
+    if merged:
+        # Entries for the previous dataset version can never be hit again
+        market_data_cache.invalidate(lambda key: key[0] in ('market_data', 'market_rows', 'listing_history', 'price_forecast', 'rental_yields', 'budget_index', 'real_medians'))
+    return merged
+
+def get_inflation_series():
+    # Y/y inflation as a MacroSeries from the macro store (kept current by inflation.py), loaded once per
+    # stored version and shared by every caller; read from the CSV until `python ingest_data.py` has run
+    version = series_version('inflation')
+    if version is None:
+        return market_data_cache.get_or_compute(('inflation_series', INFLATION_CSV, os.path.getmtime(INFLATION_CSV)), lambda: read_series_csv(INFLATION_CSV))
+    return market_data_cache.get_or_compute(('inflation_series', version), lambda: load_series('inflation'))
+
+def room_key(number_of_rooms, all_rooms=ALL_ROOMS):
+    # A falsy number_of_rooms (the UI default of 0) means "all rooms"
+    return int(number_of_rooms) if number_of_rooms else all_rooms
+
+def get_market_data(number_of_rooms, city=DEFAULT_CITY):
+    # Return median prices and standard deviation by room number for each year and month.
+    rooms = room_key(number_of_rooms)
+    cube = get_market_cube(city)
+    inflation = get_inflation_series()
+    key = ('market_data', cube.version, inflation.version, cube.city, rooms)
+    market_data = market_data_cache.get_or_compute(key, lambda: build_market_data(cube, rooms, inflation))
+    # Callers add their own keys (e.g. live prices), so never hand out the cached dict itself
+    return dict(market_data)
+
+def get_market_rows(number_of_rooms, city=DEFAULT_CITY):
+    # One row per month with sale/rent median and std, oldest first; shared, so callers must not modify it
+    rooms = room_key(number_of_rooms)
+    cube = get_market_cube(city)
+    key = ('market_rows', cube.version, cube.city, rooms)
+    return market_data_cache.get_or_compute(key, lambda: build_market_rows(cube, rooms))
+
+def build_market_rows(cube, rooms):
+    rows = {}
+    for kind in ['sale', 'rent']:
+        for year, month in cube.months(kind):
+            stats = cube.lookup(kind, year, month, rooms)
+            if stats is None:
+                continue
+            row = rows.setdefault((year, month), {'year': year, 'month': month})
+            row[f'{kind}_median'] = stats['median']
+            row[f'{kind}_std'] = stats['std']
+    yields = get_rental_yields(cube.city)
+    for (year, month), row in rows.items():
+        row['gross_yield'] = (yields.get((period_code(year, month), rooms, ALL_SIZES)) or {}).get('gross_yield')
+    return [rows[period] for period in sorted(rows)]
+
+def build_market_data(cube, rooms, inflation):
     market_data = {}
-    for year in [2023, 2024]:
-        year_data = {}
-        
-        # Sale data
-        sale_data_year = sale_data[sale_data['year'] == year]
-        if not sale_data_year.empty:
-            for month in sale_data_year['month'].unique():
-                sale_data_month = sale_data_year[sale_data_year['month'] == month]
-                median_by_rooms = sale_data_month[sale_data_month['rooms'] == number_of_rooms]['price'].median()
-                std_by_rooms = sale_data_month[sale_data_month['rooms'] == number_of_rooms]['price'].std()
-                year_data[f'sale_median_price_rooms_{month}'] = median_by_rooms
-                year_data[f'sale_std_price_rooms_{month}'] = std_by_rooms
-        
-        # Rent data
-        rent_data_year = rent_data[rent_data['year'] == year]
-        if not rent_data_year.empty:
-            for month in rent_data_year['month'].unique():
-                rent_data_month = rent_data_year[rent_data_year['month'] == month]
-                median_by_rooms = rent_data_month[rent_data_month['rooms'] == number_of_rooms]['price'].median()
-                std_by_rooms = rent_data_month[rent_data_month['rooms'] == number_of_rooms]['price'].std()
-                year_data[f'rent_median_price_rooms_{month}'] = median_by_rooms
-                year_data[f'rent_std_price_rooms_{month}'] = std_by_rooms
-        
-        inflation_rates = pd.read_csv("dataset/poland_inflation_rates_oecd.csv")
-        inflation_rates['Date'] = pd.to_datetime(inflation_rates['Date'])
-        inflation_rates = inflation_rates.set_index('Date')
-        # Convert inflation rates to a dictionary
-        inflation_rates_dict = inflation_rates.to_dict()['Rate']
-
-        # Add inflation rates to the market data
-        market_data['inflation_rates'] = inflation_rates_dict
-
-        return market_data
\ No newline at end of file
+    for kind in ['sale', 'rent']:
+        for year, month in cube.months(kind):
+            stats = cube.lookup(kind, year, month, rooms)
+            if stats is None:
+                continue
+            period = f"{year}_{month:02d}"
+            market_data[f'{kind}_median_price_rooms_{period}'] = stats['median']
+            market_data[f'{kind}_std_price_rooms_{period}'] = stats['std']
+            market_data[f'{kind}_q25_price_rooms_{period}'] = stats['q25']
+            market_data[f'{kind}_q75_price_rooms_{period}'] = stats['q75']
+            market_data[f'{kind}_median_price_per_m2_rooms_{period}'] = stats['median_price_per_m2']
+            market_data[f'{kind}_count_rooms_{period}'] = stats['count']
+
+    # Medians in money of the latest month, so months can be compared in real terms
+    real_medians = get_real_medians(cube.city)
+    for (kind, year, month, cell_rooms), real_median in real_medians['medians'].items():
+        if cell_rooms == rooms:
+            market_data[f'{kind}_real_median_price_rooms_{year}_{month:02d}'] = real_median
+    market_data['real_price_base'] = real_medians['base']
+
+    # Gross rental yield (% a year) per month, over all sizes and per size band
+    yields = get_rental_yields(cube.city)
+    for year, month in cube.months('sale'):
+        period = f"{year}_{month:02d}"
+        for band in [ALL_SIZES] + SIZE_BANDS:
+            cell = yields.get((period_code(year, month), rooms, band))
+            if cell is None:
+                continue
+            suffix = period if band is ALL_SIZES else f"size_{band}_{period}"
+            market_data[f'gross_yield_rooms_{suffix}'] = cell['gross_yield']
+
+    # Statistics over unique listings: the monthly figures above count a listing once per month it was listed
+    for kind in ['sale', 'rent']:
+        listing_stats = get_listing_history(kind, cube.city).summary(rooms)
+        market_data[f'{kind}_unique_listings_rooms'] = listing_stats['unique_listings']
+        market_data[f'{kind}_median_days_on_market_rooms'] = listing_stats['median_days_on_market']
+        market_data[f'{kind}_price_cut_rate_rooms'] = listing_stats['price_cut_rate']
+
+    # Add inflation rates to the market data, keyed 'YYYY-MM'
+    market_data['inflation_rates'] = inflation.to_dict()
+
+    return market_data
+
+def get_real_medians(city=DEFAULT_CITY):
+    # Every median in a city's cube deflated to money of its latest month in one vectorised step:
+    # {'base': 'YYYY_MM', 'medians': {(kind, year, month, rooms): real median}}; shared, so callers must not modify it
+    cube = get_market_cube(city)
+    inflation = get_inflation_series()
+    key = ('real_medians', cube.version, inflation.version, cube.city)
+    def build():
+        keys, periods, medians = cube.stat_array('median')
+        if not keys:
+            return {'base': None, 'medians': {}}
+        base = int(periods.max())
+        year, month = divmod(base, 12)
+        return {'base': f"{year}_{month + 1:02d}", 'medians': dict(zip(keys, inflation.deflate(medians, periods, base).tolist()))}
+    return market_data_cache.get_or_compute(key, build)
+
+def get_rental_yields(city=DEFAULT_CITY):
+    # Yield matrix of a city keyed (period, rooms, size band), built in one join of its sale and rent
+    # listings once per dataset version; shared, so callers must not modify it
+    cube = get_market_cube(city)
+    key = ('rental_yields', cube.version, cube.city)
+    def build():
+        current = get_manifest()
+        columns = ['price', 'rooms', 'squareMeters']
+        return yield_lookup(yield_matrix(load_frame('sale', columns, cube.city, current), load_frame('rent', columns, cube.city, current)))
+    return market_data_cache.get_or_compute(key, build)
+
+def get_rental_yield(number_of_rooms, year, month, size_band=ALL_SIZES, city=DEFAULT_CITY):
+    # Gross yield cell for one month, or None where there are too few sale or rent listings
+    rooms = room_key(number_of_rooms)
+    return get_rental_yields(city).get((period_code(year, month), rooms, size_band))
+
+def get_budget_index(kind='sale', city=DEFAULT_CITY):
+    # Price-sorted listings per (month, rooms) of a city, built once per dataset version
+    cube = get_market_cube(city)
+    key = ('budget_index', cube.version, cube.city, kind)
+    current = get_manifest()
+    entries = [current[key] for key in sorted(current) if current[key]['kind'] == kind]
+    return market_data_cache.get_or_compute(key, lambda: BudgetIndex.build(entries, cube.city))
+
+def get_affordable_listings(min_budget, max_budget, number_of_rooms=0, city=DEFAULT_CITY, kind='sale', n=5):
+    # Latest month's listings within the budget: count, median m2 and price per m2, n examples.
+    # A max_budget of 0 (the UI default) means no upper bound.
+    rooms = room_key(number_of_rooms)
+    return get_budget_index(kind, city).query(min_budget, max_budget or None, rooms, n=n)
+
+def get_listing_history(kind='sale', city=DEFAULT_CITY):
+    # Unique listings with first/last seen and per-month prices, rebuilt only when a snapshot changes
+    city = normalize_city(city)
+    current = get_manifest()
+    entries = [entry for key, entry in sorted(current.items()) if entry['kind'] == kind and city in entry['cities']]
+    key = ('listing_history', kind, city, history_version(entries))
+    return market_data_cache.get_or_compute(key, lambda: ListingHistory.for_manifest(current, kind, city))
+
+def get_price_forecast(number_of_rooms, city=DEFAULT_CITY, kind='sale'):
+    # Local trend forecast of the monthly median; shared, so callers must not modify it
+    rooms = room_key(number_of_rooms)
+    cube = get_market_cube(city)
+    inflation = get_inflation_series()
+    key = ('price_forecast', cube.version, inflation.version, cube.city, rooms, kind)
+    def fit():
+        periods = cube.months(kind)
+        medians = [(cube.lookup(kind, year, month, rooms) or {}).get('median', float('nan')) for year, month in periods]
+        return forecast_prices([period_code(year, month) for year, month in periods], medians, inflation)
+    return market_data_cache.get_or_compute(key, fit)
+
+def get_spatial_index(kind='sale', city=DEFAULT_CITY):
+    # Index over one city's partition of the most recent snapshot that has it; its grid was built at
+    # ingest time
+    city = normalize_city(city)
+    current = get_manifest()
+    entry = latest_snapshot({key: entry for key, entry in current.items() if city in entry['cities']}, kind)
+    if entry is None:
+        raise UnknownCityError(city)
+    key = ('spatial_index', kind, city, entry['sha1'])
+    return market_data_cache.get_or_compute(key, lambda: load_spatial_index(entry, city))
+
+def get_neighbourhood_data(latitude, longitude, radius_km=1.0, number_of_rooms=0, k=5, kind='sale', city=DEFAULT_CITY):
+    # Median price per m2 within radius_km of a point and the k nearest comparable listings
+    rooms = room_key(number_of_rooms, all_rooms=None)
+    index = get_spatial_index(kind, city)
+    neighbourhood = index.median_price_per_m2(latitude, longitude, radius_km, rooms)
+    neighbourhood['comparables'] = index.nearest(latitude, longitude, k, rooms)
+    return neighbourhood
@@ -0,0 +1,102 @@
+import math
+
+# Rough size of a GPT-4 token for the mostly numeric text we send; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+DEFAULT_TOKEN_BUDGET = 600
+
+MARKET_COLUMNS = ['sale_median', 'sale_std', 'rent_median', 'rent_std']
+# Gross rental yield in % a year, which needs decimals
+PERCENT_COLUMNS = ['gross_yield']
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def format_number(value):
+    # Whole PLN are enough for the model; missing months stay empty instead of printing nan
+    if value is None or value != value:
+        return ""
+    return str(int(round(value)))
+
+
+def format_percent(value):
+    if value is None or value != value:
+        return ""
+    return f"{value:.2f}"
+
+
+def format_market_table(market_rows):
+    # One CSV row per month with sale/rent median and std and the gross rental yield
+    lines = ["month," + ",".join(MARKET_COLUMNS + PERCENT_COLUMNS)]
+    for row in market_rows:
+        values = [format_number(row.get(column)) for column in MARKET_COLUMNS]
+        values += [format_percent(row.get(column)) for column in PERCENT_COLUMNS]
+        lines.append(f"{row['year']}-{row['month']:02d}," + ",".join(values))
+    return "\n".join(lines)
+
+
+def format_affordable(summary):
+    # e.g. 412 listings, median 52m2 at 14800 PLN/m2, e.g. 620000/48m2/2r 710000/55m2/3r
+    examples = " ".join(f"{listing['price']}/{listing['squareMeters']}m2/{listing['rooms']}r" for listing in summary['listings'])
+    return (f"{summary['count']} listings, median {format_number(summary['median_square_meters'])}m2 "
+            f"at {format_number(summary['median_price_per_m2'])} PLN/m2, e.g. {examples}")
+
+
+def format_neighbourhood(neighbourhood):
+    # e.g. 38 listings, median 16200 PLN/m2; nearest 650000/45m2/2r@0.21km 702000/50m2/2r@0.35km
+    nearest = " ".join(
+        f"{listing['price']}/{listing['squareMeters']}m2/{listing['rooms']}r@{listing['distance_km']:.2f}km"
+        for listing in neighbourhood['comparables']
+    )
+    return (f"{neighbourhood['count']} listings, median {format_number(neighbourhood['median_price_per_m2'])} PLN/m2; "
+            f"nearest {nearest or 'none'}")
+
+
+def downsample_inflation(inflation, months=24, step=3):
+    # Average the most recent `months` of the inflation MacroSeries into buckets of `step` months
+    periods = inflation.periods[-months:] if months else inflation.periods[:0]
+    rates = inflation.values[len(inflation.values) - len(periods):]
+    buckets = []
+    for start in range(0, len(periods), step):
+        # Labelled with the bucket's last month
+        year, month = divmod(int(periods[start:start + step][-1]), 12)
+        buckets.append((f"{year}-{month + 1:02d}", float(rates[start:start + step].mean())))
+    return buckets
+
+
+def format_inflation(buckets):
+    return " ".join(f"{label}:{rate:.1f}" for label, rate in buckets)
+
+
+def format_forecast(forecast_rows, step=12):
+    # Every step-th month of the local forecast with its 95% band, e.g. 2025-06:1100000(1000000-1210000)
+    return " ".join(
+        f"{row['Year']}-{row['Month'][:3]}:{format_number(row['Predicted Median Price'])}"
+        f"({format_number(row['Lower'])}-{format_number(row['Upper'])})"
+        for row in forecast_rows[step - 1::step]
+    )
+
+
+def build_user_content(profile, market_rows, inflation, extra=None, token_budget=DEFAULT_TOKEN_BUDGET):
+    # Compact user message: the client profile, a month table and a downsampled inflation series.
+    # When the estimate exceeds token_budget, coarsen inflation first and then drop the oldest months.
+    header = "".join(f"{label}: {value}\n" for label, value in profile)
+    footer = "".join(f"{label}: {value}\n" for label, value in (extra or []))
+
+    rows = list(market_rows)
+    inflation_plans = [(24, 3), (24, 6), (12, 12), (0, 1)]
+    while True:
+        for months, step in inflation_plans:
+            inflation_text = format_inflation(downsample_inflation(inflation, months, step))
+            content = f"{header}Market Data (PLN):\n{format_market_table(rows)}\n"
+            if inflation_text:
+                content += f"Inflation Rates (% y/y, {step}-month averages): {inflation_text}\n"
+            content += footer
+            if estimate_tokens(content) <= token_budget:
+                return content
+        if len(rows) <= 1:
+            # Nothing left to trim; the profile and the latest month always go out
+            return content
+        rows = rows[1:]
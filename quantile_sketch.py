@@ -0,0 +1,144 @@
+import math
+
+import numpy as np
+
+DEFAULT_COMPRESSION = 100
+
+
+def _scale_boundaries(compression):
+    # t-digest k1 scale function k(q) = compression / (2 pi) * asin(2q - 1): centroids are small near
+    # the tails and large around the median. A centroid may span at most one unit of k, so the
+    # quantiles where k crosses a whole number are the bucket boundaries.
+    k_min = -compression / 4
+    steps = np.arange(1, math.ceil(compression / 2) + 1)
+    k = np.minimum(k_min + steps, compression / 4)
+    return (np.sin(2 * math.pi * k / compression) + 1) / 2
+
+
+def _compress(means, weights, compression):
+    # One vectorised merging pass: sort centroids by mean, put each in the bucket its cumulative
+    # weight ends in and replace every bucket by its weighted mean
+    order = np.argsort(means, kind='stable')
+    means = means[order]
+    weights = weights[order]
+    cumulative = np.cumsum(weights)
+    boundaries = _scale_boundaries(compression) * cumulative[-1]
+    buckets = np.searchsorted(boundaries, cumulative, side='left')
+    starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+    merged_weights = np.add.reduceat(weights, starts)
+    merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+    return merged_means, merged_weights
+
+
+class TDigest:
+    # Mergeable quantile sketch. Together with the exact count/sum/sum of squares kept by the
+    # aggregate cube it answers medians, percentiles and std for any union of groups.
+    def __init__(self, means, weights, minimum, maximum, compression=DEFAULT_COMPRESSION):
+        self.means = means
+        self.weights = weights
+        self.minimum = minimum
+        self.maximum = maximum
+        self.compression = compression
+
+    @classmethod
+    def from_values(cls, values, compression=DEFAULT_COMPRESSION):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return cls(np.empty(0), np.empty(0), math.nan, math.nan, compression)
+        means, weights = _compress(values, np.ones(len(values)), compression)
+        return cls(means, weights, float(values.min()), float(values.max()), compression)
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            return other
+        means, weights = _compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights]),
+            self.compression,
+        )
+        return TDigest(means, weights, min(self.minimum, other.minimum), max(self.maximum, other.maximum), self.compression)
+
+    @classmethod
+    def merge_all(cls, digests):
+        digests = [digest for digest in digests if digest.count]
+        if not digests:
+            return cls.from_values([])
+        compression = digests[0].compression
+        means, weights = _compress(
+            np.concatenate([digest.means for digest in digests]),
+            np.concatenate([digest.weights for digest in digests]),
+            compression,
+        )
+        minimum = min(digest.minimum for digest in digests)
+        maximum = max(digest.maximum for digest in digests)
+        return cls(means, weights, minimum, maximum, compression)
+
+    def quantile(self, q):
+        total = self.count
+        if total == 0:
+            return math.nan
+        if len(self.means) == 1:
+            return float(self.means[0])
+        target = q * total
+        # Each centroid sits at the middle of its weight; interpolate between neighbouring centroids
+        # and towards the exact min/max at the tails
+        centres = np.cumsum(self.weights) - self.weights / 2
+        if target <= centres[0]:
+            return float(self.minimum + (self.means[0] - self.minimum) * target / centres[0])
+        if target >= centres[-1]:
+            tail = total - centres[-1]
+            return float(self.means[-1] + (self.maximum - self.means[-1]) * (target - centres[-1]) / tail)
+        right = int(np.searchsorted(centres, target, side='right'))
+        left = right - 1
+        fraction = (target - centres[left]) / (centres[right] - centres[left])
+        return float(self.means[left] + (self.means[right] - self.means[left]) * fraction)
+
+    def to_dict(self):
+        return {
+            'means': self.means.round(2).tolist(),
+            'weights': self.weights.tolist(),
+            'min': self.minimum,
+            'max': self.maximum,
+            'compression': self.compression,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            np.array(data['means'], dtype='float64'),
+            np.array(data['weights'], dtype='float64'),
+            data['min'],
+            data['max'],
+            data['compression'],
+        )
+
+
+def moments(values):
+    # Exact, mergeable summary: count, sum and sum of squares
+    values = np.asarray(values, dtype='float64')
+    values = values[~np.isnan(values)]
+    return {'count': int(len(values)), 'sum': float(values.sum()), 'sum_sq': float(np.square(values).sum())}
+
+
+def merge_moments(parts):
+    return {
+        'count': sum(part['count'] for part in parts),
+        'sum': sum(part['sum'] for part in parts),
+        'sum_sq': sum(part['sum_sq'] for part in parts),
+    }
+
+
+def moments_std(merged):
+    # Sample standard deviation (ddof=1), matching pandas
+    count = merged['count']
+    if count < 2:
+        return math.nan
+    variance = (merged['sum_sq'] - merged['sum'] ** 2 / count) / (count - 1)
+    return math.sqrt(max(variance, 0.0))
@@ -1,9 +1,10 @@
 import streamlit as st
-import os
-import requests
 from dotenv import load_dotenv
 import json
-from html_parser import get_median_price
+from live_refresher import budget_band, get_live_refresher
+from advisor import get_advisor
+from llm_client import LLMError
+from chat_history import ConversationHistory
 
 # Load environment variables from .env file
 load_dotenv()
@@ -24,72 +25,20 @@ if 'number_of_rooms' not in st.session_state:
 if 'should_parse_internet' not in st.session_state:
     st.session_state.should_parse_internet = False
 if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = ConversationHistory()
 
-# Define the real estate advisor class
-class RealEstateAdvisor:
-    def __init__(self, investment_purpose, risk_preference, market_data, min_budget, max_budget, number_of_rooms, should_parse_internet, chat_history):
-        self.investment_purpose = investment_purpose
-        self.risk_preference = risk_preference
-        self.market_data = market_data
-        self.min_budget = min_budget
-        self.max_budget = max_budget
-        self.number_of_rooms = number_of_rooms
-        self.should_parse_internet = should_parse_internet
-        self.chat_history = chat_history
-        self.api_request = None
-        self.prepare_api_request()
+# The advisor is stateless and shared with chatbot.py; the conversation lives in the session
+advisor = get_advisor()
 
-    def prepare_api_request(self):
-        # Create the system message to define the advisor's role
-        system_message = {
-            "role": "system",
-            "content": (
-                "You are a real estate advisor specializing in the Polish market. "
-                "Your task is to provide detailed advice based on the client's investment purpose, risk preference, budget, number of rooms, and current market data. "
-                "Use the provided market data to give precise and actionable recommendations. "
-                "Be professional, detailed, and ensure your advice is practical and based on real data."
-            )
-        }
-
-        messages = [system_message] + self.chat_history
-
-        api_request = {
-            "model": "gpt-4",
-            "messages": messages,
-            "temperature": 0.7,
-            "max_tokens": 2048,
-            "n": 1,
-            "stream": False,
-        }
-        self.api_request = api_request
-
-    def send_api_request(self, user_message):
-        api_endpoint = "https://api.openai.com/v1/chat/completions"
-        api_key = os.getenv("OPENAI_API_KEY")
-
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-        }
-
-        self.chat_history.append({"role": "user", "content": user_message})
-        self.prepare_api_request()
-
-        print("API request data:")  # Add this line for debugging
-        print(self.api_request)  # Add this line for debugging
-
-        try:
-            response = requests.post(api_endpoint, json=self.api_request, headers=headers)
-            print("API response status code:", response.status_code)  # Add this line for debugging
-            response.raise_for_status()
-            response_data = response.json()
-            assistant_response = response_data['choices'][0]['message']['content']
-            self.chat_history.append({"role": "assistant", "content": assistant_response})
-            return assistant_response
-        except requests.exceptions.RequestException as e:
-            print("Error occurred during API request:", str(e))  # Add this line for debugging
-            return f"Error: {str(e)}"
+def send_message(profile, user_message):
+    st.session_state.chat_history.append("user", user_message)
+    try:
+        assistant_response = advisor.advise(profile, st.session_state.chat_history.context())
+    except LLMError as e:
+        print("Error occurred during API request:", str(e))  # Add this line for debugging
+        return f"Error: {str(e)}"
+    st.session_state.chat_history.append("assistant", assistant_response)
+    return assistant_response
 
 
 # Streamlit interface
@@ -118,23 +67,17 @@ st.session_state.number_of_rooms = st.number_input("Number of Rooms", min_value=
 st.session_state.should_parse_internet = st.checkbox("Should Parse Internet", value=st.session_state.should_parse_internet)
 
 if st.session_state.should_parse_internet:
-    base_url = 'https://www.otodom.pl/_next/data/lG7lHcURBL6PPE-_9iij8/pl/wyniki/wynajem/mieszkanie/cala-polska.json'
-    search_params = {
-        'distanceRadius': '75',
-        'limit': '36',
-        'ownerTypeSingleSelect': 'ALL',
-        'priceMin': str(st.session_state.min_budget),
-        'priceMax': str(st.session_state.max_budget),
-        'areaMin': '100',
-        'areaMax': '250',
-        'roomsNumber': '%5BTHREE' if st.session_state.number_of_rooms == 3 else '%5BTHREE%2CFOUR%5D',
-        'by': 'PRICE',
-        'direction': 'DESC',
-        'viewType': 'listing',
-        'page': 1
-    }
-    median_price = get_median_price(base_url, search_params)
+    # Live medians are collected by a background thread shared with chatbot.py; the page only reads
+    # the latest value
+    live_refresher = get_live_refresher()
+    live_key = (st.session_state.number_of_rooms, budget_band(st.session_state.min_budget, st.session_state.max_budget))
+    live_refresher.request(live_key)
+    median_price, age = live_refresher.store.get(live_key)
     st.session_state.market_data = {"median_price": median_price}
+    if median_price is not None:
+        st.caption(f"Live median price: {median_price:,.0f} PLN (updated {age / 60:.0f} min ago)")
+    else:
+        st.caption("Live median price is being collected in the background.")
 else:
     market_data_input = st.text_area("Market Data (JSON format)", json.dumps(st.session_state.market_data, indent=2))
     if market_data_input:
@@ -143,23 +86,21 @@ else:
         except json.JSONDecodeError:
             st.error("Invalid JSON format")
 
-advisor = RealEstateAdvisor(
-    st.session_state.investment_purpose,
-    st.session_state.risk_preference,
-    st.session_state.market_data,
-    st.session_state.min_budget,
-    st.session_state.max_budget,
-    st.session_state.number_of_rooms,
-    st.session_state.should_parse_internet,
-    st.session_state.chat_history
-)
+profile = {
+    'investment_purpose': st.session_state.investment_purpose,
+    'risk_preference': st.session_state.risk_preference,
+    'min_budget': st.session_state.min_budget,
+    'max_budget': st.session_state.max_budget,
+    'number_of_rooms': st.session_state.number_of_rooms,
+    'live_median_price': st.session_state.market_data.get("median_price") if isinstance(st.session_state.market_data, dict) else None,
+}
 
 st.header("Chat with the Real Estate Advisor")
 user_input = st.text_input("Your message")
 
 if st.button("Send"):
     if user_input:
-        advisor_response = advisor.send_api_request(user_input)
+        advisor_response = send_message(profile, user_input)
         st.write("### Advisor's Response:")
         st.write(advisor_response)
 
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from market_cube import ALL_ROOMS
+
+# Listing areas in m2 are grouped into bands [edge, next edge)
+SIZE_BAND_EDGES = [40, 60, 80, 100]
+SIZE_BANDS = ['under_40', '40_60', '60_80', '80_100', 'over_100']
+
+# Lookups with size_band=ALL_SIZES cover every size (and rooms=ALL_ROOMS every room count)
+ALL_SIZES = None
+
+# Cells with fewer sale or rent listings than this are too noisy to quote a yield for
+MIN_LISTINGS = 5
+
+# Stands in for "all" while grouping, since pandas drops missing group keys
+ANY = -1
+
+KEY_COLUMNS = ['period', 'rooms', 'band']
+
+
+def cell_medians(df):
+    # Median price per m2 and listing count for every (period, rooms, size band), plus the cells with
+    # all room counts, all sizes or both rolled up, from one frame of listings
+    listings = pd.DataFrame({
+        'period': df['period'].to_numpy().astype('int32'),
+        'rooms': df['rooms'].to_numpy().astype('int16'),
+        'band': np.digitize(df['squareMeters'], SIZE_BAND_EDGES).astype('int16'),
+        'price_per_m2': df['price'].to_numpy() / df['squareMeters'].to_numpy(),
+    })
+    parts = []
+    for all_rooms, all_sizes in [(False, False), (True, False), (False, True), (True, True)]:
+        keys = listings.assign(rooms=ANY if all_rooms else listings['rooms'], band=ANY if all_sizes else listings['band'])
+        parts.append(keys.groupby(KEY_COLUMNS)['price_per_m2'].agg(['median', 'count']))
+    return pd.concat(parts)
+
+
+def yield_matrix(sale_df, rent_df):
+    # Gross rental yield (% a year) per cell: twelve months of median rent per m2 over the median sale
+    # price per m2. Per m2 medians keep the size mix of sale and rent listings in a cell from skewing it.
+    matrix = cell_medians(sale_df).join(cell_medians(rent_df), how='inner', lsuffix='_sale', rsuffix='_rent')
+    matrix = matrix[(matrix['count_sale'] >= MIN_LISTINGS) & (matrix['count_rent'] >= MIN_LISTINGS)]
+    matrix = matrix.assign(gross_yield=12 * matrix['median_rent'] / matrix['median_sale'] * 100)
+    return matrix.rename(columns={
+        'median_sale': 'sale_price_per_m2',
+        'median_rent': 'rent_price_per_m2',
+        'count_sale': 'sale_count',
+        'count_rent': 'rent_count',
+    })
+
+
+def yield_lookup(matrix):
+    # {(period, rooms or ALL_ROOMS, size band name or ALL_SIZES): cell} for O(1) lookups
+    lookup = {}
+    for (period, rooms, band), cell in matrix.to_dict('index').items():
+        key = (int(period), ALL_ROOMS if rooms == ANY else int(rooms), ALL_SIZES if band == ANY else SIZE_BANDS[band])
+        lookup[key] = {
+            'gross_yield': float(cell['gross_yield']),
+            'sale_price_per_m2': float(cell['sale_price_per_m2']),
+            'rent_price_per_m2': float(cell['rent_price_per_m2']),
+            'sale_count': int(cell['sale_count']),
+            'rent_count': int(cell['rent_count']),
+        }
+    return lookup
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from market_cache import LRUCache
+
+DEFAULT_TTL = 24 * 3600
+
+# Fields that change how a reply is delivered but not what it says
+TRANSPORT_FIELDS = {'stream'}
+
+
+def request_key(api_request):
+    # Canonical hash of a prepared api_request: key order and whitespace do not matter
+    payload = {field: value for field, value in api_request.items() if field not in TRANSPORT_FIELDS}
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    # Replies to identical advisory requests, held in an in-memory LRU and optionally in SQLite
+    # so they survive restarts. Entries expire ttl seconds after they were stored.
+    def __init__(self, max_entries=1024, ttl=DEFAULT_TTL, path=None, max_disk_entries=100000):
+        self.memory = LRUCache(max_entries)
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.db.commit()
+
+    def get(self, api_request):
+        key = request_key(api_request)
+        now = time.time()
+        entry = self.memory.get(key)
+        if entry is not None and entry[0] > now:
+            return self._hit(entry[1])
+
+        if self.db is not None:
+            with self.lock:
+                row = self.db.execute(
+                    "SELECT response, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                    self.db.commit()
+            if row is not None:
+                self.memory.set(key, (row[1], row[0]))
+                return self._hit(row[0])
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def _hit(self, response):
+        with self.lock:
+            self.hits += 1
+        return response
+
+    def set(self, api_request, response):
+        key = request_key(api_request)
+        now = time.time()
+        expires_at = now + self.ttl
+        self.memory.set(key, (expires_at, response))
+        if self.db is None:
+            return
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, expires_at, now),
+            )
+            # Drop expired rows, then the least recently used ones beyond max_disk_entries
+            self.db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+            self.db.commit()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_entries': self.memory.stats()['entries'],
+            }
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_response_cache():
+    # One cache per process; set RESPONSE_CACHE_PATH to a file to keep replies across restarts
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(
+                ttl=float(os.getenv("RESPONSE_CACHE_TTL", DEFAULT_TTL)),
+                path=os.getenv("RESPONSE_CACHE_PATH"),
+            )
+        return _default_cache
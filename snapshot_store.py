@@ -0,0 +1,422 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from listing_ids import ID_DTYPE, id_keys, pack_ids
+from spatial_index import GRID_COLUMNS, SpatialIndex, build_grid
+
+# Every monthly snapshot is converted once into one .npy file per column, partitioned by city under
+# STORE_DIR/<kind>/<YYYY_MM>/city=<city>/, so serving code memory-maps only the partition and columns it needs
+DATASET_DIR = "dataset"
+STORE_DIR = os.path.join(DATASET_DIR, "store")
+MANIFEST_PATH = os.path.join(STORE_DIR, "manifest.json")
+CATEGORIES_PATH = os.path.join(STORE_DIR, "categories.json")
+
+# Bumped whenever the on-disk column layout changes, so every snapshot is re-ingested once
+STORE_FORMAT = 4
+
+SNAPSHOT_NAME_PATTERN = re.compile(r"apartments_(?:(rent)_)?pl_(\d{4})_(\d{2})\.csv$")
+
+# Numeric columns kept from the raw snapshots and the narrowest dtype that holds them: prices up to
+# ~4.3 billion PLN, areas up to 65535 m2, coordinates to ~0.5 m
+NUMERIC_COLUMNS = {
+    'id': ID_DTYPE,
+    'price': 'uint32',
+    'rooms': 'uint8',
+    'squareMeters': 'uint16',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'centreDistance': 'float32',
+    'schoolDistance': 'float32',
+    'clinicDistance': 'float32',
+    'postOfficeDistance': 'float32',
+    'kindergartenDistance': 'float32',
+    'restaurantDistance': 'float32',
+    'collegeDistance': 'float32',
+    'pharmacyDistance': 'float32',
+}
+
+# String columns stored as small integer codes; -1 marks a missing value. City is the partition key,
+# so its code is recorded in the manifest rather than stored per row.
+CATEGORICAL_COLUMNS = ['city', 'type']
+
+# dtypes the raw CSV columns are parsed with; snapshots are read in chunks of this many rows
+CSV_DTYPES = dict(
+    {column: 'float32' if dtype == 'float32' else 'float64' for column, dtype in NUMERIC_COLUMNS.items()},
+    id='str',
+    city='str',
+    type='str',
+)
+CSV_CHUNK_ROWS = 50000
+
+# Year and month of a snapshot as one number (year * 12 + month - 1); uint16 lasts until the year 5461
+PERIOD_DTYPE = 'uint16'
+
+
+def parse_snapshot_name(path):
+    # apartments_pl_2024_06.csv -> ('sale', 2024, 6), apartments_rent_pl_2024_06.csv -> ('rent', 2024, 6)
+    match = SNAPSHOT_NAME_PATTERN.search(os.path.basename(path))
+    if match is None:
+        return None
+    kind = 'rent' if match.group(1) else 'sale'
+    return kind, int(match.group(2)), int(match.group(3))
+
+
+def discover_snapshots(dataset_dir=DATASET_DIR):
+    # Every apartments_*_YYYY_MM.csv in the dataset directory, oldest month first
+    paths = [path for path in glob.glob(os.path.join(dataset_dir, "apartments_*.csv")) if parse_snapshot_name(path)]
+    return sorted(paths, key=lambda path: (parse_snapshot_name(path)[1:], path))
+
+
+def pending_snapshots(paths, manifest=None):
+    # Snapshots that are new or whose contents changed since they were last ingested
+    if manifest is None:
+        manifest = load_manifest()
+    pending = []
+    for path in paths:
+        kind, year, month = parse_snapshot_name(path)
+        if needs_ingest(path, manifest.get(snapshot_key(kind, year, month))):
+            pending.append(path)
+    return pending
+
+
+def period_code(year, month):
+    return year * 12 + month - 1
+
+
+def snapshot_key(kind, year, month):
+    return f"{kind}/{year}_{month:02d}"
+
+
+def snapshot_dir(kind, year, month):
+    return os.path.join(STORE_DIR, kind, f"{year}_{month:02d}")
+
+
+def partition_dir(kind, year, month, city):
+    return os.path.join(snapshot_dir(kind, year, month), f"city={city}")
+
+
+def normalize_city(name):
+    # 'Kraków' -> 'krakow', matching the city names used in the snapshots
+    name = name.strip().lower().replace('ł', 'l')
+    return unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+
+
+def snapshot_cities(manifest):
+    return sorted({city for entry in manifest.values() for city in entry['cities']})
+
+
+def read_json(path, default):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return default
+
+
+def write_json(path, data):
+    # Write to a temporary file first so readers never see a half-written manifest
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def load_manifest():
+    return read_json(MANIFEST_PATH, {})
+
+
+def load_categories():
+    return read_json(CATEGORIES_PATH, {column: [] for column in CATEGORICAL_COLUMNS})
+
+
+def file_hash(path):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def merge_categories(categories, values):
+    # Global codes for a file's values; codes are append-only, so codes written by earlier snapshots stay valid
+    codes = []
+    for value in values:
+        if value not in categories:
+            categories.append(value)
+        codes.append(categories.index(value))
+    return codes
+
+
+def category_code(column, value, categories=None):
+    if categories is None:
+        categories = load_categories()
+    try:
+        return categories[column].index(value)
+    except ValueError:
+        return None
+
+
+def downcast(values, dtype):
+    # Refuse to silently wrap values that do not fit the stored dtype; NaN and inf have no integer
+    # value and would be cast to garbage
+    dtype = np.dtype(dtype)
+    if dtype.kind in 'ui' and len(values):
+        if values.dtype.kind == 'f' and not np.isfinite(values).all():
+            raise ValueError(f"{np.count_nonzero(~np.isfinite(values))} missing or infinite values do not fit {dtype}")
+        limits = np.iinfo(dtype)
+        if values.min() < limits.min or values.max() > limits.max:
+            raise ValueError(f"Values {values.min()}..{values.max()} do not fit {dtype}")
+    return values.astype(dtype)
+
+
+def memory_report(df):
+    # Bytes per column, counting the Python objects behind object columns, and the total
+    usage = df.memory_usage(index=False, deep=True)
+    return {'rows': len(df), 'columns': {column: int(size) for column, size in usage.items()}, 'total': int(usage.sum())}
+
+
+def needs_ingest(path, entry, cities=None):
+    if entry is None or entry.get('format') != STORE_FORMAT:
+        return True
+    if entry.get('city_filter') != (sorted(cities) if cities is not None else None):
+        return True
+    stat = os.stat(path)
+    if stat.st_mtime == entry['mtime'] and stat.st_size == entry['size']:
+        return False
+    # The file was touched; only re-ingest if its contents actually changed
+    return file_hash(path) != entry['sha1']
+
+
+def read_snapshot(path, cities=None, chunksize=CSV_CHUNK_ROWS):
+    # Stored columns only, parsed straight into their dtypes; with cities, other rows are dropped chunk by chunk
+    chunks = []
+    for chunk in pd.read_csv(path, usecols=list(CSV_DTYPES), dtype=CSV_DTYPES, chunksize=chunksize):
+        if cities is not None:
+            chunk = chunk[chunk['city'].isin(cities)]
+        chunks.append(chunk)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def ingest_snapshot(path, kind, year, month, cities=None):
+    # Convert one snapshot into its partitions. Runs in a worker process, so categorical columns are
+    # coded against this file's own categories (in order of first appearance) and the manifest entry
+    # gets global codes when ingest merges the results.
+    started = time.perf_counter()
+    df = read_snapshot(path, cities)
+    read_seconds = time.perf_counter() - started
+
+    # Listings without a price, room count or area cannot be stored in their integer columns
+    integer_columns = [column for column, dtype in NUMERIC_COLUMNS.items() if np.dtype(dtype).kind in 'ui']
+    df = df.dropna(subset=integer_columns)
+    df['id'] = pack_ids(df['id'])
+    # Round square meters to the nearest integer
+    df['squareMeters'] = df['squareMeters'].round()
+    local_categories = {}
+    for column in CATEGORICAL_COLUMNS:
+        codes, uniques = pd.factorize(df[column])
+        df[column] = codes.astype('int16')
+        local_categories[column] = list(uniques)
+
+    out_dir = snapshot_dir(kind, year, month)
+    # Start from an empty directory so partitions of cities that disappeared do not linger
+    shutil.rmtree(out_dir, ignore_errors=True)
+    partitions = {}
+    # Rows without a city (code -1) belong to no partition
+    for city_code, city_df in df[df['city'] >= 0].groupby('city'):
+        city = local_categories['city'][city_code]
+        city_dir = partition_dir(kind, year, month, city)
+        os.makedirs(city_dir)
+        for column, dtype in NUMERIC_COLUMNS.items():
+            np.save(os.path.join(city_dir, f"{column}.npy"), downcast(city_df[column].to_numpy(), dtype))
+        np.save(os.path.join(city_dir, "type.npy"), city_df['type'].to_numpy())
+        for column, values in build_grid(city_df['latitude'], city_df['longitude']).items():
+            np.save(os.path.join(city_dir, f"{column}.npy"), values)
+        partitions[city] = {'rows': len(city_df)}
+
+    stat = os.stat(path)
+    entry = {
+        'kind': kind,
+        'year': year,
+        'month': month,
+        'source': path,
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'sha1': file_hash(path),
+        'rows': len(df),
+        'cities': partitions,
+        'city_filter': sorted(cities) if cities is not None else None,
+        'format': STORE_FORMAT,
+    }
+    timing = {'read': read_seconds, 'total': time.perf_counter() - started}
+    return entry, local_categories, timing
+
+
+def merge_snapshot(entry, local_categories, categories):
+    # Give a worker's entry global category codes, in the same order a serial ingest would assign them
+    city_codes = merge_categories(categories['city'], local_categories['city'])
+    for city, partition in entry['cities'].items():
+        partition['code'] = city_codes[local_categories['city'].index(city)]
+
+    type_codes = merge_categories(categories['type'], local_categories['type'])
+    if type_codes != list(range(len(type_codes))):
+        # The last slot maps the missing-value code -1 to itself
+        lookup = np.array(type_codes + [-1], dtype='int16')
+        for city in entry['cities']:
+            type_path = os.path.join(partition_dir(entry['kind'], entry['year'], entry['month'], city), "type.npy")
+            np.save(type_path, lookup[np.load(type_path)])
+    return entry
+
+
+def ingest(paths, cities=None, workers=None):
+    # Convert every changed snapshot in paths into the columnar store and return the manifest. Files are
+    # converted in parallel across `workers` processes (default: one per core); with cities, only those
+    # cities' rows are kept.
+    os.makedirs(STORE_DIR, exist_ok=True)
+    manifest = load_manifest()
+    categories = load_categories()
+    if cities is not None:
+        cities = {normalize_city(city) for city in cities}
+    changed = False
+
+    jobs = []
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"File not found: {path}")
+            continue
+        parsed = parse_snapshot_name(path)
+        if parsed is None:
+            print(f"Not a snapshot file: {path}")
+            continue
+        kind, year, month = parsed
+        key = snapshot_key(kind, year, month)
+        entry = manifest.get(key)
+
+        if not needs_ingest(path, entry, cities):
+            if entry['mtime'] != os.stat(path).st_mtime:
+                # Same contents under a new mtime; remember it so we skip hashing next time
+                entry['mtime'] = os.stat(path).st_mtime
+                changed = True
+            continue
+        jobs.append((key, path, kind, year, month))
+
+    if jobs:
+        started = time.perf_counter()
+        workers = min(workers or os.cpu_count() or 1, len(jobs))
+        results = {}
+        failed = {}
+        if workers == 1:
+            for key, path, kind, year, month in jobs:
+                try:
+                    results[key] = ingest_snapshot(path, kind, year, month, cities)
+                except Exception as e:
+                    failed[key] = e
+                report_ingest(len(results) + len(failed), len(jobs), path, results.get(key), failed.get(key))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(ingest_snapshot, path, kind, year, month, cities): (key, path) for key, path, kind, year, month in jobs}
+                for future in as_completed(futures):
+                    key, path = futures[future]
+                    try:
+                        results[key] = future.result()
+                    except Exception as e:
+                        failed[key] = e
+                    report_ingest(len(results) + len(failed), len(jobs), path, results.get(key), failed.get(key))
+
+        # Merged in path order, not completion order, so category codes do not depend on scheduling
+        for key, path, kind, year, month in jobs:
+            if key in results:
+                entry, local_categories, _ = results[key]
+                manifest[key] = merge_snapshot(entry, local_categories, categories)
+            else:
+                # Its old partitions may already be gone; the next ingest retries the file
+                manifest.pop(key, None)
+        changed = True
+
+        elapsed = time.perf_counter() - started
+        busy = sum(timing['total'] for _, _, timing in results.values())
+        print(f"Ingested {len(results)} of {len(jobs)} snapshots in {elapsed:.1f}s on {workers} workers "
+              f"({busy:.1f}s of work, {busy / elapsed if elapsed else 0:.1f}x parallel)")
+
+    if changed:
+        write_json(CATEGORIES_PATH, categories)
+        write_json(MANIFEST_PATH, manifest)
+    return manifest
+
+
+def report_ingest(done, total, path, result, error):
+    name = os.path.basename(path)
+    if error is not None:
+        print(f"[{done}/{total}] {name}: failed: {error}")
+        return
+    entry, _, timing = result
+    print(f"[{done}/{total}] {name}: {entry['rows']:,} rows, {len(entry['cities'])} cities in {timing['total']:.2f}s "
+          f"(read {timing['read']:.2f}s, write {timing['total'] - timing['read']:.2f}s)")
+
+
+def load_columns(kind, year, month, city, columns):
+    # Memory-map the requested columns of one city partition; nothing is read until the arrays are touched
+    city_dir = partition_dir(kind, year, month, city)
+    return {column: np.load(os.path.join(city_dir, f"{column}.npy"), mmap_mode='r') for column in columns}
+
+
+def load_partition_frame(entry, city, columns):
+    stored = [column for column in columns if column != 'city']
+    data = load_columns(entry['kind'], entry['year'], entry['month'], city, stored)
+    if 'city' in columns:
+        data['city'] = np.full(entry['cities'][city]['rows'], entry['cities'][city]['code'], dtype='int16')
+    if 'id' in columns:
+        # pandas has no fixed-width bytes dtype, so frames carry the id as a uint64 key
+        data['id'] = id_keys(data['id'])
+    return pd.DataFrame({column: data[column] for column in columns})
+
+
+def load_snapshot_frame(entry, columns, city=None):
+    # Build a DataFrame of the requested columns for a single ingested snapshot;
+    # with a city only that city's partition is read
+    if city is not None:
+        city = normalize_city(city)
+        if city in entry['cities']:
+            df = load_partition_frame(entry, city, columns)
+        else:
+            df = pd.DataFrame({column: [] for column in columns})
+    else:
+        frames = [load_partition_frame(entry, name, columns) for name in sorted(entry['cities'])]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({column: [] for column in columns})
+    df['period'] = np.full(len(df), period_code(entry['year'], entry['month']), dtype=PERIOD_DTYPE)
+    return df
+
+
+def load_frame(kind, columns, city=None, manifest=None):
+    # Build a DataFrame of the requested columns for every ingested snapshot of this kind
+    if manifest is None:
+        manifest = load_manifest()
+
+    frames = []
+    for key in sorted(manifest):
+        entry = manifest[key]
+        if entry['kind'] != kind:
+            continue
+        frames.append(load_snapshot_frame(entry, columns, city))
+
+    if not frames:
+        return pd.DataFrame(columns=list(columns) + ['period'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def latest_snapshot(manifest, kind):
+    keys = [key for key, entry in manifest.items() if entry['kind'] == kind]
+    return manifest[max(keys)] if keys else None
+
+
+def load_spatial_index(entry, city):
+    columns = ['id', 'price', 'rooms', 'squareMeters'] + GRID_COLUMNS
+    return SpatialIndex(load_columns(entry['kind'], entry['year'], entry['month'], normalize_city(city), columns))
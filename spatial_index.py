@@ -0,0 +1,111 @@
+import math
+
+import numpy as np
+
+from listing_ids import id_hex
+
+# Listings are projected onto a flat km grid; at Polish latitudes an equirectangular projection
+# around 52N is accurate to well under 1% over neighbourhood distances
+REFERENCE_LATITUDE = 52.0
+KM_PER_DEGREE_LATITUDE = 110.574
+KM_PER_DEGREE_LONGITUDE = 111.320 * math.cos(math.radians(REFERENCE_LATITUDE))
+
+CELL_KM = 0.5
+# kNN searches widen their radius up to this before giving up
+MAX_SEARCH_KM = 50.0
+
+
+def project(latitude, longitude):
+    return (np.asarray(longitude, dtype='float64') * KM_PER_DEGREE_LONGITUDE,
+            np.asarray(latitude, dtype='float64') * KM_PER_DEGREE_LATITUDE)
+
+
+def cell_keys(x, y, cell_km=CELL_KM):
+    # One int64 key per grid cell; coordinates in Poland are positive so no offset is needed
+    return (np.floor(x / cell_km).astype('int64') << 32) | np.floor(y / cell_km).astype('int64')
+
+
+def build_grid(latitude, longitude, cell_km=CELL_KM):
+    # Projected coordinates, row order sorted by cell and the start offset of every non-empty cell;
+    # written at ingest time so queries only memory-map them
+    x, y = project(latitude, longitude)
+    keys = cell_keys(x, y, cell_km)
+    order = np.argsort(keys, kind='stable').astype('int32')
+    cells, starts = np.unique(keys[order], return_index=True)
+    offsets = np.append(starts, len(order)).astype('int32')
+    return {
+        'grid_x': x.astype('float32'),
+        'grid_y': y.astype('float32'),
+        'grid_order': order,
+        'grid_cells': cells,
+        'grid_offsets': offsets,
+    }
+
+
+GRID_COLUMNS = ['grid_x', 'grid_y', 'grid_order', 'grid_cells', 'grid_offsets']
+
+
+class SpatialIndex:
+    # Radius and k-nearest queries over one snapshot. `arrays` holds the snapshot columns
+    # (price, rooms, squareMeters, id) and the grid written by build_grid.
+    def __init__(self, arrays, cell_km=CELL_KM):
+        self.arrays = arrays
+        self.cell_km = cell_km
+        self.x = arrays['grid_x']
+        self.y = arrays['grid_y']
+        self.order = arrays['grid_order']
+        self.cells = arrays['grid_cells']
+        self.offsets = arrays['grid_offsets']
+
+    def candidates(self, x0, y0, radius_km):
+        # Rows in every grid cell overlapping the query circle's bounding box
+        low_x, high_x = math.floor((x0 - radius_km) / self.cell_km), math.floor((x0 + radius_km) / self.cell_km)
+        low_y, high_y = math.floor((y0 - radius_km) / self.cell_km), math.floor((y0 + radius_km) / self.cell_km)
+        slices = []
+        for cell_x in range(low_x, high_x + 1):
+            # Cells of one column are contiguous in key order, so one binary search covers the column
+            start = np.searchsorted(self.cells, (cell_x << 32) | low_y)
+            end = np.searchsorted(self.cells, (cell_x << 32) | high_y, side='right')
+            if start < end:
+                slices.append(self.order[self.offsets[start]:self.offsets[end]])
+        if not slices:
+            return np.empty(0, dtype='int32')
+        return np.concatenate(slices)
+
+    def within(self, latitude, longitude, radius_km, rooms=None):
+        # (row indices, distances in km) of listings within radius_km of the point
+        x0, y0 = project(latitude, longitude)
+        x0, y0 = float(x0), float(y0)
+        rows = self.candidates(x0, y0, radius_km)
+        if rooms is not None:
+            rows = rows[self.arrays['rooms'][rows] == rooms]
+        distances = np.hypot(self.x[rows] - x0, self.y[rows] - y0)
+        inside = distances <= radius_km
+        return rows[inside], distances[inside]
+
+    def median_price_per_m2(self, latitude, longitude, radius_km, rooms=None):
+        rows, _ = self.within(latitude, longitude, radius_km, rooms)
+        if len(rows) == 0:
+            return {'count': 0, 'median_price_per_m2': math.nan}
+        price_per_m2 = self.arrays['price'][rows] / self.arrays['squareMeters'][rows]
+        return {'count': int(len(rows)), 'median_price_per_m2': float(np.median(price_per_m2))}
+
+    def nearest(self, latitude, longitude, k=5, rooms=None):
+        # Widen the search circle until it holds k listings; those are then exactly the k nearest
+        radius_km = self.cell_km
+        while True:
+            rows, distances = self.within(latitude, longitude, radius_km, rooms)
+            if len(rows) >= k or radius_km >= MAX_SEARCH_KM:
+                break
+            radius_km *= 2
+        nearest = np.argsort(distances, kind='stable')[:k]
+        return [
+            {
+                'id': id_hex(self.arrays['id'][row]),
+                'price': int(self.arrays['price'][row]),
+                'rooms': int(self.arrays['rooms'][row]),
+                'squareMeters': int(self.arrays['squareMeters'][row]),
+                'distance_km': round(float(distance), 3),
+            }
+            for row, distance in zip(rows[nearest], distances[nearest])
+        ]
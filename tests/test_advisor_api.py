@@ -0,0 +1,98 @@
+import contextlib
+import json
+
+import pytest
+
+import parser_1
+from advisor import api, core
+from llm_client import LLMClient
+from mock_llm_server import run_mock_llm_server
+from response_cache import ResponseCache
+
+API_REQUEST = {"model": "gpt-4", "messages": [{"role": "user", "content": "Advice please"}]}
+
+
+@pytest.fixture
+def client():
+    return api.app.test_client()
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    # The core with its market-data prompt replaced by a fixed request and its LLM by a local mock
+    monkeypatch.setattr(core, 'profile_request', lambda profile, messages=(), token_budget=None: dict(API_REQUEST))
+    monkeypatch.setattr(core, 'get_default_response_cache', lambda: ResponseCache())
+    with contextlib.ExitStack() as stack:
+        def start(**server_options):
+            server = stack.enter_context(run_mock_llm_server(**server_options))
+            llm_client = LLMClient(api_endpoint=server.url, api_key="test", max_retries=2, backoff_base=0)
+            monkeypatch.setattr(core, 'get_default_client', lambda: llm_client)
+            return server
+        yield start
+
+
+@pytest.mark.parametrize('body', [
+    '[1, 2]',
+    '{"profile": "warszawa"}',
+    '{"messages": {"role": "user"}}',
+    '{"profile": {"min_budget": "inf"}}',
+    '{"profile": {"max_budget": 1e400}}',
+    '{"profile": {"number_of_rooms": "two"}}',
+    '{"profile": {"min_budget": [1]}}',
+    '{"profile": {"city": 123}}',
+    '{"profile": {"city": ["a"]}}',
+    '{"profile": {"live_median_price": "nan"}}',
+    '{"profile": {"latitude": "north", "longitude": 21.0}}',
+])
+@pytest.mark.parametrize('path', ['/advice', '/advice/stream'])
+def test_invalid_profile_is_rejected(client, path, body):
+    response = client.post(path, data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid profile'}
+
+
+@pytest.mark.parametrize('path', ['/advice', '/advice/stream'])
+def test_unknown_city_is_not_found(client, monkeypatch, path):
+    monkeypatch.setattr(parser_1, 'get_manifest', lambda: {})
+    response = client.post(path, json={'profile': {'city': 'atlantis'}})
+    assert response.status_code == 404
+    assert 'atlantis' in response.get_json()['error']
+
+
+def test_unknown_city_market_data_is_not_found(client, monkeypatch):
+    monkeypatch.setattr(parser_1, 'get_manifest', lambda: {})
+    assert client.get('/market-data?city=atlantis').status_code == 404
+    assert client.get('/forecast?city=atlantis').status_code == 404
+
+
+@pytest.mark.parametrize('query', ['', '?lat=52.2', '?lat=52.2&lon=inf', '?lat=52.2&lon=21&radius_km=0', '?lat=52.2&lon=21&k=0'])
+def test_invalid_neighbourhood_query_is_rejected(client, query):
+    assert client.get('/neighbourhood' + query).status_code == 400
+
+
+def test_unknown_city_neighbourhood_is_not_found(client, monkeypatch):
+    monkeypatch.setattr(parser_1, 'get_manifest', lambda: {})
+    assert client.get('/neighbourhood?lat=52.2&lon=21&city=atlantis').status_code == 404
+
+
+@pytest.mark.parametrize('path', ['/advice', '/advice/stream'])
+def test_llm_failure_is_bad_gateway(client, llm, path):
+    llm(failures=[503, 503])
+    response = client.post(path, json={'profile': {}})
+    assert response.status_code == 502
+    assert response.get_json()['status_code'] == 503
+
+
+def test_advice_replies(client, llm):
+    server = llm(reply="Buy now.")
+    response = client.post('/advice', json={'profile': {}, 'messages': [{'role': 'user', 'content': 'Hi'}]})
+    assert response.status_code == 200
+    assert response.get_json() == {'reply': "Buy now."}
+    assert len(server.requests) == 1
+
+
+def test_advice_stream_replies(client, llm):
+    llm(reply="Buy now, prices are rising.", chunk_size=4)
+    response = client.post('/advice/stream', data=json.dumps({'profile': {}}), content_type='application/json')
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == "Buy now, prices are rising."
@@ -0,0 +1,88 @@
+import json
+import time
+
+import pytest
+
+import batch_advisor
+from llm_client import LLMClient
+from mock_llm_server import run_mock_llm_server
+from response_cache import ResponseCache
+
+
+@pytest.fixture(autouse=True)
+def offline_core(monkeypatch):
+    # Prompts without market data, and a fresh response cache per test
+    def profile_request(profile, messages=()):
+        return {"model": "gpt-4", "messages": [{"role": "user", "content": f"{profile['max_budget']} {profile['question']}"}]}
+    monkeypatch.setattr(batch_advisor, 'profile_request', profile_request)
+    monkeypatch.setattr(batch_advisor, 'warm_market_data', lambda profiles: 0)
+    monkeypatch.setattr(batch_advisor, 'get_default_response_cache', lambda: ResponseCache())
+
+
+def write_profiles(path, rows):
+    with open(path, 'w') as f:
+        for row in rows:
+            f.write((row if isinstance(row, str) else json.dumps(row)) + "\n")
+
+
+def read_records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_bad_rows_are_recorded_and_the_rest_run(tmp_path):
+    input_path, output_path = tmp_path / "profiles.jsonl", tmp_path / "results.jsonl"
+    write_profiles(input_path, [
+        {'id': 'ok', 'max_budget': 500000, 'question': 'Buy?'},
+        {'id': 'rooms', 'number_of_rooms': 'two'},
+        {'id': 'city', 'city': 123},
+        '{"id": "cut',
+        '[1, 2]',
+    ])
+    with run_mock_llm_server(reply="Yes") as server:
+        summary = batch_advisor.run_batch(str(input_path), str(output_path), client=LLMClient(api_endpoint=server.url))
+    assert summary['succeeded'] == 1 and summary['failed'] == 4
+    records = {record['id']: record for record in read_records(output_path)}
+    assert records['ok']['response'] == "Yes"
+    assert set(records) == {'ok', 'rooms', 'city', '3', '4'}
+    assert all(records[row_id]['error'].startswith("Invalid profile") for row_id in ('rooms', 'city', '3', '4'))
+
+
+def test_rerun_resumes_and_retries_failures(tmp_path):
+    input_path, output_path = tmp_path / "profiles.jsonl", tmp_path / "results.jsonl"
+    write_profiles(input_path, [{'id': str(i), 'max_budget': 100000 * i} for i in range(4)])
+    # The first request fails for good (400 is not retried); the others are answered
+    with run_mock_llm_server(reply="Yes", failures=[400]) as server:
+        client = LLMClient(api_endpoint=server.url)
+        first = batch_advisor.run_batch(str(input_path), str(output_path), concurrency=1, rate=1000, client=client)
+        assert first['succeeded'] == 3 and first['failed'] == 1
+        second = batch_advisor.run_batch(str(input_path), str(output_path), concurrency=1, rate=1000, client=client)
+        assert second == dict(second, succeeded=1, failed=0, skipped=3)
+        assert len(server.requests) == 5
+    # A truncated line from an interrupted run is ignored
+    with open(output_path, 'a') as f:
+        f.write('{"id": "0", "resp')
+    assert batch_advisor.completed_ids(str(output_path)) == {'0', '1', '2', '3'}
+
+
+def test_requests_run_concurrently_within_the_rate_limit(tmp_path):
+    input_path, output_path = tmp_path / "profiles.jsonl", tmp_path / "results.jsonl"
+    write_profiles(input_path, [{'id': str(i), 'max_budget': 100000 * i} for i in range(8)])
+    with run_mock_llm_server(reply="Yes", latency=0.2) as server:
+        client = LLMClient(api_endpoint=server.url, max_concurrency=4)
+        started = time.monotonic()
+        summary = batch_advisor.run_batch(str(input_path), str(output_path), concurrency=4, rate=1000, client=client)
+        elapsed = time.monotonic() - started
+    assert summary['succeeded'] == 8
+    # Two waves of four, not eight requests one after another
+    assert 0.4 <= elapsed < 1.2
+
+    output_path = tmp_path / "limited.jsonl"
+    with run_mock_llm_server(reply="Yes") as server:
+        client = LLMClient(api_endpoint=server.url, max_concurrency=4)
+        started = time.monotonic()
+        summary = batch_advisor.run_batch(str(input_path), str(output_path), concurrency=4, rate=10, client=client)
+        elapsed = time.monotonic() - started
+    assert summary['succeeded'] == 8
+    # A burst of four, then the remaining four at 10 per second
+    assert elapsed >= 0.35
@@ -0,0 +1,127 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import budget_index
+from budget_index import BudgetIndex
+from listing_ids import ID_DTYPE, id_hex
+from market_cube import ALL_ROOMS
+from snapshot_store import period_code
+
+MONTHS = [(2024, 1), (2024, 2), (2024, 3)]
+
+
+@pytest.fixture(scope='module')
+def listings():
+    # Round prices so budgets land exactly on listing prices, with plenty of ties
+    rng = np.random.default_rng(3)
+    frames = []
+    for year, month in MONTHS:
+        count = 400
+        frames.append(pd.DataFrame({
+            'id': [bytes.fromhex(f"{year:04d}{month:02d}{row:026x}") for row in range(count)],
+            'price': rng.integers(30, 120, count) * 10000,
+            'rooms': rng.integers(1, 5, count),
+            'squareMeters': rng.integers(20, 120, count),
+            'period': period_code(year, month),
+            'year': year,
+            'month': month,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.fixture(scope='module')
+def index(listings):
+    def load_columns(kind, year, month, city, columns):
+        month_listings = listings[(listings['year'] == year) & (listings['month'] == month)]
+        return {
+            'id': np.array(month_listings['id'].tolist(), dtype=ID_DTYPE),
+            'price': month_listings['price'].to_numpy('uint32'),
+            'rooms': month_listings['rooms'].to_numpy('uint8'),
+            'squareMeters': month_listings['squareMeters'].to_numpy('uint16'),
+        }
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(budget_index, 'load_columns', load_columns)
+        entries = [{'kind': 'sale', 'year': year, 'month': month, 'cities': ['warszawa']} for year, month in MONTHS]
+        # A month without this city is skipped
+        entries.append({'kind': 'sale', 'year': 2024, 'month': 4, 'cities': ['krakow']})
+        return BudgetIndex.build(entries, 'warszawa')
+
+
+def expected(listings, min_budget, max_budget, rooms, period):
+    selected = listings[(listings['period'] == period) & (listings['price'] >= min_budget)]
+    if max_budget is not None:
+        selected = selected[selected['price'] <= max_budget]
+    if rooms is not ALL_ROOMS:
+        selected = selected[selected['rooms'] == rooms]
+    return selected
+
+
+@pytest.mark.parametrize('min_budget, max_budget', [
+    (0, None),
+    (500000, 800000),
+    # Budgets exactly on listing prices include them at both ends
+    (300000, 300000),
+    (1190000, None),
+    (0, 300000),
+    (455000, 456000),
+    (800000, 500000),
+    (2000000, None),
+])
+@pytest.mark.parametrize('rooms', [ALL_ROOMS, 1, 4])
+@pytest.mark.parametrize('month', [0, 2])
+def test_query_matches_pandas_filter(listings, index, min_budget, max_budget, rooms, month):
+    period = period_code(*MONTHS[month])
+    result = index.query(min_budget, max_budget, rooms, period=period, n=5)
+    selected = expected(listings, min_budget, max_budget, rooms, period)
+
+    assert result['period'] == period
+    assert result['count'] == len(selected)
+    if selected.empty:
+        assert math.isnan(result['median_square_meters']) and math.isnan(result['median_price_per_m2'])
+        assert result['listings'] == []
+        return
+    assert result['median_square_meters'] == selected['squareMeters'].median()
+    assert result['median_price_per_m2'] == pytest.approx((selected['price'] / selected['squareMeters']).median(), rel=1e-6)
+
+    picks = result['listings']
+    assert len(picks) == min(5, len(selected))
+    prices = [listing['price'] for listing in picks]
+    assert prices == sorted(prices)
+    assert prices[0] == selected['price'].min() and prices[-1] == selected['price'].max()
+    ids = set(selected['id'].map(id_hex))
+    assert all(listing['id'] in ids for listing in picks)
+    assert all(listing['rooms'] == rooms for listing in picks if rooms is not ALL_ROOMS)
+
+
+def test_default_period_is_the_latest_month(listings, index):
+    latest = period_code(*MONTHS[-1])
+    assert index.periods == [period_code(*month) for month in MONTHS]
+    assert index.query()['period'] == latest
+    assert index.query()['count'] == len(expected(listings, 0, None, ALL_ROOMS, latest))
+
+
+def test_partitions_cover_every_month_twice(listings, index):
+    # Each month's rows appear once grouped by rooms and once in the ALL_ROOMS partition
+    assert len(index.columns['price']) == 2 * len(listings)
+    for year, month in MONTHS:
+        period = period_code(year, month)
+        start, end = index.partitions[(period, ALL_ROOMS)]
+        month_listings = listings[listings['period'] == period]
+        assert end - start == len(month_listings)
+        assert np.all(np.diff(index.columns['price'][start:end].astype('int64')) >= 0)
+        for rooms, group in month_listings.groupby('rooms'):
+            start, end = index.partitions[(period, rooms)]
+            assert sorted(index.columns['price'][start:end]) == sorted(group['price'])
+            assert set(index.columns['rooms'][start:end]) == {rooms}
+
+
+def test_missing_partitions_and_empty_index(index):
+    assert index.query(rooms=9)['count'] == 0
+    assert index.query(period=period_code(2023, 1))['count'] == 0
+    empty = BudgetIndex.build([], 'warszawa')
+    result = empty.query(0, None)
+    assert result['count'] == 0 and result['period'] is None and result['listings'] == []
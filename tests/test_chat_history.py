@@ -0,0 +1,88 @@
+from chat_history import SUMMARY_SNIPPET_CHARS, SUMMARY_TOKEN_BUDGET, ConversationHistory, summarize_messages
+from prompt_builder import estimate_tokens
+
+
+def message(number, tokens=100):
+    # Roughly `tokens` tokens of text, recognisable by its number
+    text = f"message {number} "
+    return text + "x" * (4 * tokens - len(text))
+
+
+def recording_summarizer(calls):
+    def summarize(previous_summary, messages):
+        calls.append([item["content"][:10] for item in messages])
+        return summarize_messages(previous_summary, messages)
+    return summarize
+
+
+def test_repeated_turn_is_stored_once():
+    history = ConversationHistory()
+    history.append("user", "Should I buy?")
+    history.append("user", "Should I buy?")
+    history.append("assistant", "Yes")
+    history.append("user", "Should I buy?")
+    assert [item["content"] for item in history.messages] == ["Should I buy?", "Yes", "Should I buy?"]
+
+
+def test_short_conversation_is_sent_whole():
+    history = ConversationHistory()
+    history.append("user", "Hi")
+    history.append("assistant", "Hello")
+    assert history.context() == history.messages
+
+
+def test_context_stays_within_budget():
+    history = ConversationHistory(token_budget=SUMMARY_TOKEN_BUDGET + 300)
+    for number in range(10):
+        history.append("user" if number % 2 == 0 else "assistant", message(number))
+    context = history.context()
+
+    # A summary of the seven oldest turns, then the three newest that fit in the remaining 300 tokens
+    assert context[0]["role"] == "system"
+    assert [item["content"] for item in context[1:]] == [message(7), message(8), message(9)]
+    assert estimate_tokens(history.summary) <= SUMMARY_TOKEN_BUDGET
+    assert sum(estimate_tokens(item["content"]) for item in context) <= history.token_budget
+    # The transcript itself is kept for display
+    assert len(history.messages) == 10
+
+
+def test_newest_message_goes_out_even_when_over_budget():
+    history = ConversationHistory(token_budget=SUMMARY_TOKEN_BUDGET + 50)
+    history.append("user", message(0, tokens=40))
+    history.append("user", message(1, tokens=500))
+    context = history.context()
+    assert context[-1]["content"] == message(1, tokens=500)
+    assert "message 0" in context[0]["content"]
+
+
+def test_summary_is_updated_incrementally():
+    calls = []
+    history = ConversationHistory(token_budget=SUMMARY_TOKEN_BUDGET + 200, summarizer=recording_summarizer(calls))
+    for number in range(4):
+        history.append("user", message(number))
+    history.context()
+    assert calls == [["message 0 ", "message 1 "]]
+
+    # Nothing new rolled off: the summary is reused as is
+    history.context()
+    assert len(calls) == 1
+
+    history.append("assistant", message(4))
+    history.context()
+    # Only the newly rolled-off turn is folded in
+    assert calls[-1] == ["message 2 "]
+    assert "message 0" in history.summary and "message 2" in history.summary
+
+
+def test_summarize_messages_truncates_and_caps():
+    long_text = "word " * 100
+    summary = summarize_messages("", [{"role": "user", "content": long_text}])
+    assert summary.startswith("user: word word")
+    assert summary.endswith("...")
+    assert len(summary) <= len("user: ") + SUMMARY_SNIPPET_CHARS + 3
+
+    for number in range(50):
+        summary = summarize_messages(summary, [{"role": "assistant", "content": f"reply {number} " + long_text}])
+    assert estimate_tokens(summary) <= SUMMARY_TOKEN_BUDGET
+    # The newest lines survive
+    assert summary.split("\n")[-1].startswith("assistant: reply 49")
@@ -0,0 +1,54 @@
+import pytest
+
+from forecast_lines import ForecastStreamParser, local_forecast_dataframe, parse_forecast_text
+
+REPLY = (
+    "Prices should keep rising.\n"
+    "2024,August,150000\n"
+    "2025,August,160000.5\n"
+    "Not a forecast, 2025 is a good year\n"
+    "2026,August,170000"
+)
+ROWS = [
+    {"Year": 2024, "Month": "August", "Predicted Median Price": 150000.0},
+    {"Year": 2025, "Month": "August", "Predicted Median Price": 160000.5},
+    {"Year": 2026, "Month": "August", "Predicted Median Price": 170000.0},
+]
+
+
+def test_parse_forecast_text():
+    assert parse_forecast_text(REPLY) == ROWS
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 19, len(REPLY)])
+def test_stream_parser_matches_whole_reply(chunk_size):
+    parser = ForecastStreamParser()
+    completed = []
+    for start in range(0, len(REPLY), chunk_size):
+        completed.extend(parser.feed(REPLY[start:start + chunk_size]))
+    # The last line has no newline, so it only completes on close
+    assert completed == ROWS[:2]
+    assert parser.close() == ROWS[2:]
+    assert parser.rows == ROWS
+    assert parser.close() == []
+
+
+def test_partial_price_is_not_read_until_its_line_ends():
+    parser = ForecastStreamParser()
+    assert parser.feed("2025,August,16") == []
+    assert parser.feed("0000") == []
+    assert parser.feed("\r\n2026,Aug") == [{"Year": 2025, "Month": "August", "Predicted Median Price": 160000.0}]
+    assert parser.feed("ust,170000\n") == [{"Year": 2026, "Month": "August", "Predicted Median Price": 170000.0}]
+    assert parser.close() == []
+
+
+def test_close_without_a_final_line():
+    parser = ForecastStreamParser()
+    parser.feed("No forecast today.")
+    assert parser.close() == []
+    assert parser.rows == []
+
+
+def test_local_forecast_dataframe_handles_no_rows():
+    df = local_forecast_dataframe([])
+    assert df.empty and "Date" in df.columns
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from forecaster import FORECAST_MONTHS, MIN_MONTHS_FOR_SEASONALITY, forecast_prices
+from macro_series import MacroSeries
+from snapshot_store import period_code
+
+START = period_code(2022, 1)
+NO_INFLATION = MacroSeries([START], [0.0])
+
+
+def predicted(rows):
+    return np.array([row["Predicted Median Price"] for row in rows])
+
+
+def seasonal_prices(months, noise=0.0):
+    # 0.5% a month of growth, 5% dearer every June, slight noise so the band has a width
+    rng = np.random.default_rng(4)
+    periods = np.arange(START, START + months)
+    june = (periods % 12 + 1) == 6
+    prices = 500000 * np.exp(0.005 * (periods - START) + 0.05 * june + rng.normal(0, noise, months))
+    return periods, prices
+
+
+@pytest.mark.parametrize('medians', [
+    [],
+    [500000.0],
+    [500000.0, 510000.0],
+    [500000.0, np.nan, 510000.0, np.nan],
+    [500000.0, 0.0, 510000.0, -1.0],
+])
+def test_fewer_than_three_valid_months_give_no_forecast(medians):
+    assert forecast_prices(np.arange(START, START + len(medians)), medians, NO_INFLATION) == []
+
+
+def test_nan_medians_are_skipped():
+    periods, prices = seasonal_prices(12, noise=0.01)
+    with_gaps = prices.copy()
+    with_gaps[[2, 7]] = np.nan
+    keep = ~np.isnan(with_gaps)
+    assert forecast_prices(periods, with_gaps, NO_INFLATION) == forecast_prices(periods[keep], prices[keep], NO_INFLATION)
+
+
+def test_trend_is_extrapolated_exactly_without_noise():
+    periods = np.arange(START, START + 12)
+    rows = forecast_prices(periods, 500000 * 1.01 ** (periods - START), NO_INFLATION, horizon=6)
+    assert [(row["Year"], row["Month"]) for row in rows] == [(2023, "January"), (2023, "February"), (2023, "March"),
+                                                             (2023, "April"), (2023, "May"), (2023, "June")]
+    assert predicted(rows) == pytest.approx(500000 * 1.01 ** np.arange(12, 18), rel=1e-9)
+
+
+def test_real_prices_are_reinflated():
+    # Flat real prices with 12% y/y inflation: nominal prices keep rising by the monthly inflation step
+    inflation = MacroSeries([START], [12.0])
+    periods = np.arange(START, START + 12)
+    nominal = 500000 * np.exp(np.log1p(0.12) / 12 * (periods - START))
+    rows = forecast_prices(periods, nominal, inflation, horizon=12)
+    assert predicted(rows) == pytest.approx(500000 * np.exp(np.log1p(0.12) / 12 * np.arange(12, 24)), rel=1e-9)
+
+
+def test_seasonality_switches_on_at_two_years():
+    # Without month-of-year terms the June bump is averaged into the trend; with them it is forecast
+    short = forecast_prices(*seasonal_prices(MIN_MONTHS_FOR_SEASONALITY - 1), NO_INFLATION, horizon=24)
+    long = forecast_prices(*seasonal_prices(MIN_MONTHS_FOR_SEASONALITY), NO_INFLATION, horizon=24)
+
+    short_steps = np.diff(np.log(predicted(short)))
+    assert short_steps == pytest.approx(np.full(len(short_steps), short_steps[0]))
+
+    june = [row["Month"] == "June" for row in long]
+    may = [row["Month"] == "May" for row in long]
+    assert np.log(predicted(long)[june] / predicted(long)[may]) == pytest.approx(0.055, abs=1e-6)
+
+
+@pytest.mark.parametrize('months', [6, MIN_MONTHS_FOR_SEASONALITY + 6])
+def test_band_contains_the_prediction_and_widens(months):
+    rows = forecast_prices(*seasonal_prices(months, noise=0.02), NO_INFLATION)
+    assert len(rows) == FORECAST_MONTHS
+    assert all(row["Lower"] <= row["Predicted Median Price"] <= row["Upper"] for row in rows)
+    widths = [np.log(row["Upper"] / row["Lower"]) for row in rows]
+    assert widths[-1] > widths[0]
@@ -0,0 +1,121 @@
+import json
+import statistics
+import time
+
+import pytest
+
+from html_parser import OtodomScraper, get_median_price, sample_pages
+from mock_otodom_server import load_recordings, run_mock_otodom_server, synthetic_page
+from rate_limit import TokenBucket
+
+SEARCH_PARAMS = {'roomsNumber': '%5BTWO%5D', 'page': 1}
+
+
+def page_prices(page):
+    return [300000 + 1000 * page + i for i in range(3)]
+
+
+@pytest.fixture
+def recordings(tmp_path):
+    # Ten result pages saved the way real _next/data responses are recorded
+    directory = tmp_path / "recordings"
+    directory.mkdir()
+    for page in range(1, 11):
+        with open(directory / f"page_{page}.json", "w") as f:
+            json.dump(synthetic_page(10, page_prices(page)), f)
+    return load_recordings(str(directory))
+
+
+def scraper(server, tmp_path, **options):
+    # No rate limiting, so tests do not wait on the shared limiter
+    options = dict({'sample_size': 4, 'bucket': TokenBucket(1000, 1000), 'cache_dir': str(tmp_path / "cache")}, **options)
+    return OtodomScraper(server.url, SEARCH_PARAMS, **options)
+
+
+@pytest.mark.parametrize('total_pages, count, expected', [
+    (0, 6, []),
+    (1, 6, [1]),
+    (1, 1, [1]),
+    (10, 0, [1]),
+    (10, 1, [1]),
+    (10, 2, [1, 10]),
+    (10, 4, [1, 4, 7, 10]),
+    (5, 5, [1, 2, 3, 4, 5]),
+    (3, 6, [1, 2, 3]),
+])
+def test_sample_pages(total_pages, count, expected):
+    assert sample_pages(total_pages, count) == expected
+
+
+def test_recordings_are_loaded_by_page(recordings):
+    assert sorted(recordings) == list(range(1, 11))
+    assert recordings[3]['pageProps']['data']['searchAds']['pagination']['totalPages'] == 10
+
+
+def test_crawl_collects_the_sampled_pages(recordings, tmp_path):
+    with run_mock_otodom_server(recordings) as server:
+        prices = scraper(server, tmp_path).crawl()
+        assert sorted(server.requests) == [1, 4, 7, 10]
+    assert sorted(prices) == sorted(price for page in [1, 4, 7, 10] for price in page_prices(page))
+
+
+def test_median_is_over_every_collected_price(recordings, tmp_path):
+    with run_mock_otodom_server(recordings) as server:
+        median = get_median_price(server.url, SEARCH_PARAMS, sample_size=4, bucket=TokenBucket(1000, 1000),
+                                  cache_dir=str(tmp_path / "cache"))
+    assert median == statistics.median(price for page in [1, 4, 7, 10] for price in page_prices(page))
+
+
+def test_single_page_and_empty_results(tmp_path):
+    with run_mock_otodom_server({1: synthetic_page(1, [500000, 700000])}) as server:
+        assert sorted(scraper(server, tmp_path).crawl()) == [500000, 700000]
+        assert server.requests == [1]
+    with run_mock_otodom_server({1: synthetic_page(0, [])}) as server:
+        assert scraper(server, tmp_path, cache_dir=str(tmp_path / "empty")).crawl() == []
+        assert get_median_price(server.url, SEARCH_PARAMS, bucket=TokenBucket(1000, 1000),
+                                cache_dir=str(tmp_path / "empty")) is None
+
+
+def test_fresh_pages_are_served_from_the_cache(recordings, tmp_path):
+    with run_mock_otodom_server(recordings) as server:
+        first = scraper(server, tmp_path).crawl()
+        # A new crawl (no saved state) within the TTL sends no requests at all
+        for path in (tmp_path / "cache").glob("crawl_*.json"):
+            path.unlink()
+        second = scraper(server, tmp_path).crawl()
+        assert len(server.requests) == 4
+    assert sorted(first) == sorted(second)
+
+
+def test_stale_pages_are_revalidated_with_etags(recordings, tmp_path):
+    with run_mock_otodom_server(recordings) as server:
+        first = scraper(server, tmp_path, cache_ttl=0.2).crawl()
+        time.sleep(0.3)
+        second = scraper(server, tmp_path, cache_ttl=0.2).crawl()
+        # Every page went over the wire again, and every one came back 304 Not Modified
+        assert sorted(server.requests) == [1, 1, 4, 4, 7, 7, 10, 10]
+        assert sorted(server.not_modified) == [1, 4, 7, 10]
+    assert sorted(first) == sorted(second)
+
+
+def test_changed_pages_are_fetched_again_after_the_ttl(recordings, tmp_path):
+    with run_mock_otodom_server(recordings) as server:
+        scraper(server, tmp_path, cache_ttl=0.2).crawl()
+        server.pages[4] = synthetic_page(10, [1])
+        time.sleep(0.3)
+        prices = scraper(server, tmp_path, cache_ttl=0.2).crawl()
+        assert sorted(server.not_modified) == [1, 7, 10]
+    assert 1 in prices
+
+
+def test_interrupted_crawl_resumes_from_saved_state(recordings, tmp_path):
+    # Pages 7 and 10 fail in the first crawl; the second only asks for those
+    with run_mock_otodom_server({page: data for page, data in recordings.items() if page not in (7, 10)}) as server:
+        first = scraper(server, tmp_path).crawl()
+        assert sorted(server.requests) == [1, 4, 7, 10]
+        assert sorted(first) == sorted(page_prices(1) + page_prices(4))
+
+        server.pages = recordings
+        second = scraper(server, tmp_path).crawl()
+        assert sorted(server.requests) == [1, 4, 7, 7, 10, 10]
+    assert sorted(second) == sorted(price for page in [1, 4, 7, 10] for price in page_prices(page))
@@ -0,0 +1,63 @@
+import math
+
+import numpy as np
+import pytest
+
+import listing_history
+from listing_history import DAYS_PER_MONTH, ListingHistory
+from listing_ids import ID_DTYPE
+
+
+def test_history_without_partitions_is_empty():
+    history = ListingHistory.for_manifest({}, 'sale', 'nowhere')
+    assert len(history) == 0
+    summary = history.summary()
+    assert summary['unique_listings'] == 0
+    assert math.isnan(summary['median_days_on_market'])
+    assert math.isnan(summary['price_cut_rate'])
+
+
+def test_history_joins_listings_across_months(monkeypatch):
+    # id -> (price, rooms) per month; 'b' is listed twice in January and 'c' twice in March
+    months = {
+        1: [('a', 500, 2), ('b', 400, 1), ('d', 600, 3), ('b', 410, 1)],
+        2: [('b', 410, 1), ('a', 500, 2)],
+        3: [('c', 300, 2), ('a', 450, 3), ('d', 650, 3), ('c', 300, 2)],
+    }
+
+    def load_columns(kind, year, month, city, columns):
+        rows = months[month]
+        return {
+            'id': np.array([listing_id.encode() for listing_id, _, _ in rows], dtype=ID_DTYPE),
+            'price': np.array([price for _, price, _ in rows], dtype='uint32'),
+            'rooms': np.array([rooms for _, _, rooms in rows], dtype='uint8'),
+            'squareMeters': np.full(len(rows), 50, dtype='uint16'),
+        }
+
+    monkeypatch.setattr(listing_history, 'load_columns', load_columns)
+    entries = [{'kind': 'sale', 'year': 2024, 'month': month, 'cities': ['warszawa'], 'sha1': str(month)} for month in months]
+    history = ListingHistory.build(entries, 'warszawa')
+
+    rows = {listing_id.rstrip(b'\0').decode(): row for row, listing_id in enumerate(history.ids)}
+    assert sorted(rows) == ['a', 'b', 'c', 'd']
+    first_seen = {listing_id: int(history.first_seen[row]) for listing_id, row in rows.items()}
+    last_seen = {listing_id: int(history.last_seen[row]) for listing_id, row in rows.items()}
+    assert first_seen == {'a': 0, 'b': 0, 'c': 2, 'd': 0}
+    assert last_seen == {'a': 2, 'b': 1, 'c': 2, 'd': 2}
+
+    days = history.days_on_market()
+    assert days[rows['a']] == pytest.approx(3 * DAYS_PER_MONTH)
+    assert days[rows['b']] == pytest.approx(2 * DAYS_PER_MONTH)
+    assert days[rows['c']] == pytest.approx(DAYS_PER_MONTH)
+    # Of a repeated row the last one wins
+    assert history.prices[rows['b']].tolist()[:2] == [410, 410]
+    # The latest snapshot wins for attributes
+    assert history.rooms[rows['a']] == 3
+
+    cuts = history.price_cuts()
+    assert cuts[rows['a']] and not cuts[rows['b']] and not cuts[rows['d']]
+    summary = history.summary()
+    assert summary['unique_listings'] == 4
+    # a, b and d were seen in two snapshots and only a was cut
+    assert summary['price_cut_rate'] == pytest.approx(1 / 3)
+    assert summary['median_price'] == np.median([450, 410, 300, 650])
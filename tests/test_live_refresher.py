@@ -0,0 +1,34 @@
+from html_parser import OtodomScraper, otodom_bucket
+from live_refresher import LiveMedianRefresher, LiveMedianStore
+
+KEY = (2, (300000, 400000))
+
+
+def test_failed_key_is_not_requeued_until_backoff_passes():
+    store = LiveMedianStore()
+    refresher = LiveMedianRefresher(store)
+    refresher.request(KEY)
+    assert refresher.pending == [KEY]
+
+    refresher.pending = []
+    store.record_failure(KEY, "no prices collected")
+    refresher.request(KEY)
+    assert refresher.pending == []
+    assert store.retry_in(KEY) > 0
+
+    # A second failure doubles the wait
+    first_wait = store.retry_in(KEY)
+    store.record_failure(KEY, "no prices collected")
+    assert store.retry_in(KEY) > first_wait
+
+    # A retry becomes possible once the backoff has passed
+    assert store.retry_in(KEY, backoff=0) == 0
+    store.record_success(KEY, 350000)
+    assert store.retry_in(KEY) == 0
+    assert store.get(KEY)[0] == 350000
+
+
+def test_scrapers_share_one_limiter(tmp_path):
+    first = OtodomScraper("http://localhost", {'page': 1}, cache_dir=str(tmp_path))
+    second = OtodomScraper("http://localhost", {'page': 1}, cache_dir=str(tmp_path))
+    assert first.bucket is second.bucket is otodom_bucket
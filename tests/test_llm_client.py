@@ -0,0 +1,125 @@
+import asyncio
+import email.utils
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+from llm_client import LLMClient, LLMError, retry_after_seconds
+from llm_stream import iter_stream_deltas
+from mock_llm_server import run_mock_llm_server
+
+API_REQUEST = {"model": "gpt-4", "messages": [{"role": "user", "content": "Advice please"}]}
+
+
+def make_client(server, **options):
+    options = dict({'api_key': "test", 'max_retries': 3, 'backoff_base': 0.01, 'backoff_cap': 0.05}, **options)
+    return LLMClient(api_endpoint=server.url, **options)
+
+
+@pytest.mark.parametrize('status', [429, 500, 502, 503, 504])
+def test_transient_failures_are_retried(status):
+    with run_mock_llm_server(reply="Buy", failures=[status, status]) as server:
+        assert make_client(server).complete(API_REQUEST) == "Buy"
+        assert len(server.requests) == 3
+
+
+def test_failure_on_the_last_attempt_raises_with_its_status():
+    with run_mock_llm_server(reply="Buy", failures=[503, 503, 429]) as server:
+        with pytest.raises(LLMError) as error:
+            make_client(server).complete(API_REQUEST)
+        assert error.value.status_code == 429
+        assert len(server.requests) == 3
+
+
+def test_client_errors_are_not_retried():
+    with run_mock_llm_server(reply="Buy", failures=[401]) as server:
+        with pytest.raises(LLMError) as error:
+            make_client(server).complete(API_REQUEST)
+        assert error.value.status_code == 401
+        assert len(server.requests) == 1
+
+
+def test_retry_after_is_honoured():
+    # Without Retry-After, full jitter on a 10 s base would wait up to the 5 s cap
+    with run_mock_llm_server(reply="Buy", failures=[429], retry_after=0.3) as server:
+        client = make_client(server, backoff_base=10.0, backoff_cap=5.0)
+        started = time.monotonic()
+        assert client.complete(API_REQUEST) == "Buy"
+        assert 0.3 <= time.monotonic() - started < 2.0
+
+
+def test_retry_after_forms():
+    def response(value):
+        response = requests.Response()
+        if value is not None:
+            response.headers['Retry-After'] = value
+        return response
+
+    assert retry_after_seconds(response("2")) == 2.0
+    assert retry_after_seconds(response("-1")) == 0.0
+    assert retry_after_seconds(response(None)) is None
+    assert retry_after_seconds(response("soon")) is None
+    in_ten_seconds = email.utils.formatdate(time.time() + 10, usegmt=True)
+    assert 8 <= retry_after_seconds(response(in_ten_seconds)) <= 10
+    # Retry-After never waits longer than the backoff cap
+    assert LLMClient(backoff_cap=1.0).backoff_delay(0, response("60")) == 1.0
+
+
+def test_connection_errors_are_retried_then_raised():
+    # A port nothing listens on
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    client = LLMClient(api_endpoint=f"http://127.0.0.1:{port}/v1/chat/completions", api_key="test",
+                       max_retries=2, backoff_base=0.01, backoff_cap=0.01)
+    with pytest.raises(LLMError):
+        client.complete(API_REQUEST)
+
+
+def test_stream_yields_the_reply_in_chunks():
+    with run_mock_llm_server(reply="Prices will rise slowly.", chunk_size=5, failures=[503]) as server:
+        chunks = list(make_client(server).stream(API_REQUEST))
+        assert "".join(chunks) == "Prices will rise slowly."
+        assert len(chunks) == 5
+        assert server.requests[-1]['stream'] is True
+
+
+@pytest.mark.parametrize('event', ['data: {not json', 'data: 5'])
+def test_malformed_stream_chunk_raises_llm_error(event):
+    with run_mock_llm_server(reply="Partial", extra_events=[event]) as server:
+        chunks = []
+        with pytest.raises(LLMError):
+            for chunk in make_client(server).stream(API_REQUEST):
+                chunks.append(chunk)
+        assert "".join(chunks) == "Partial"
+
+
+def test_stream_deltas_skip_keep_alives_and_stop_at_done():
+    lines = [b'', ': keep-alive', 'event: message', 'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+             'data: {"choices": [{"delta": {"content": "Hi"}}]}', 'data: [DONE]', 'data: {"choices": []}']
+    assert list(iter_stream_deltas(lines)) == ["Hi"]
+
+
+def test_acomplete_retries():
+    with run_mock_llm_server(reply="Buy", failures=[503]) as server:
+        assert asyncio.run(make_client(server).acomplete(API_REQUEST)) == "Buy"
+        assert len(server.requests) == 2
+
+
+def test_sync_and_async_callers_share_the_concurrency_limit():
+    with run_mock_llm_server(reply="Buy", latency=0.3) as server:
+        client = make_client(server, max_concurrency=1)
+        started = time.monotonic()
+        thread = threading.Thread(target=client.complete, args=(API_REQUEST,))
+        thread.start()
+
+        async def both():
+            return await asyncio.gather(client.acomplete(API_REQUEST), client.acomplete(API_REQUEST))
+
+        assert asyncio.run(both()) == ["Buy", "Buy"]
+        thread.join()
+        # Three requests one at a time
+        assert time.monotonic() - started >= 0.9
@@ -0,0 +1,79 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from market_cube import ALL_ROOMS, MarketCube, month_cells, sketch_error_report
+from quantile_sketch import DEFAULT_COMPRESSION
+
+MONTHS = [(2024, 1), (2024, 2), (2024, 3), (2024, 4)]
+# Largest allowed distance between q and the exact rank of the estimated q-quantile
+RANK_ERROR = 0.01
+# In groups of a few hundred listings one central centroid holds up to pi / compression of the
+# prices, which bounds the interpolation error there
+SMALL_GROUP_RANK_ERROR = math.pi / DEFAULT_COMPRESSION
+
+
+@pytest.fixture(scope='module')
+def listings():
+    # A few thousand listings a month with prices that grow with rooms and drift over time
+    rng = np.random.default_rng(1)
+    frames = []
+    for offset, (year, month) in enumerate(MONTHS):
+        rooms = rng.integers(1, 5, 3000)
+        square_meters = np.round(rng.normal(25 + 15 * rooms, 8).clip(15))
+        price = np.round(square_meters * rng.lognormal(np.log(15000) + 0.01 * offset, 0.3), -3)
+        frames.append(pd.DataFrame({
+            'price': price, 'rooms': rooms, 'squareMeters': square_meters, 'period': f"{year}_{month:02d}",
+            'year': year, 'month': month,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.fixture(scope='module')
+def cube(listings):
+    cube = MarketCube('warszawa')
+    for (year, month), df in listings.groupby(['year', 'month']):
+        for rooms, stats in month_cells(df[['price', 'rooms', 'squareMeters', 'period']]):
+            cube.cells[('sale', year, month, rooms)] = stats
+    cube.periods['sale'] = list(MONTHS)
+    return cube
+
+
+@pytest.mark.parametrize('periods, rooms', [
+    (None, ALL_ROOMS),
+    ([(2024, 1), (2024, 3)], [2, 3]),
+    ([(2024, 2), (2024, 3), (2024, 4)], [1]),
+    ([(2024, 4)], ALL_ROOMS),
+])
+def test_merged_stats_match_pandas(listings, cube, periods, rooms):
+    selected = listings
+    if periods is not None:
+        selected = selected[[(year, month) in periods for year, month in zip(selected['year'], selected['month'])]]
+    if rooms is not ALL_ROOMS:
+        selected = selected[selected['rooms'].isin(rooms)]
+    prices = selected['price']
+
+    stats = cube.merged_stats('sale', periods, rooms)
+    assert stats['count'] == len(prices)
+    assert stats['mean'] == pytest.approx(prices.mean(), rel=1e-9)
+    assert stats['std'] == pytest.approx(prices.std(), rel=1e-6)
+    for q, name in [(0.25, 'q25'), (0.5, 'median'), (0.75, 'q75')]:
+        below, at_or_below = (prices < stats[name]).mean(), (prices <= stats[name]).mean()
+        assert max(0.0, below - q, q - at_or_below) <= RANK_ERROR
+        assert stats[name] == pytest.approx(prices.quantile(q), rel=0.02)
+
+
+def test_merged_stats_without_cells(cube):
+    stats = cube.merged_stats('rent')
+    assert stats['count'] == 0
+    assert np.isnan(stats['median'])
+
+
+def test_sketch_error_report_within_rank_error(listings):
+    # Every (month, rooms) cell of the cube, about 750 listings each
+    report = sketch_error_report(listings, group_columns=('period', 'rooms'))
+    assert len(report) == len(MONTHS) * 4 * 3
+    assert (report['rank_error'] <= SMALL_GROUP_RANK_ERROR).all()
+    assert (report['relative_error'] <= 0.02).all()
@@ -0,0 +1,45 @@
+from macro_series import MacroSeries, parse_period
+from prompt_builder import build_user_content, downsample_inflation, estimate_tokens
+
+PROFILE = [("City", "Warszawa"), ("Number of Rooms", 2)]
+
+
+def market_rows(months):
+    return [
+        {'year': 2022 + month // 12, 'month': month % 12 + 1, 'sale_median': 800000 + 1000 * month,
+         'sale_std': 150000, 'rent_median': 3500, 'rent_std': 700, 'gross_yield': 5.2}
+        for month in range(months)
+    ]
+
+
+def inflation_series(months=36):
+    start = parse_period('2021-01')
+    return MacroSeries([start + month for month in range(months)], [2.0 + 0.5 * month for month in range(months)])
+
+
+def test_downsample_inflation_averages_buckets_labelled_by_last_month():
+    series = MacroSeries([parse_period('2023-01'), parse_period('2023-02'), parse_period('2023-03')], [1.0, 2.0, 6.0])
+    assert downsample_inflation(series, months=24, step=3) == [('2023-03', 3.0)]
+    assert downsample_inflation(series, months=0, step=1) == []
+
+
+def test_build_user_content_fits_generous_budget_with_finest_inflation():
+    content = build_user_content(PROFILE, market_rows(6), inflation_series(), token_budget=10000)
+    assert "Inflation Rates (% y/y, 3-month averages)" in content
+
+
+def test_build_user_content_coarsens_inflation_over_several_passes():
+    # Too small for the 3- and 6-month plans, so the loop goes through more than one downsampling pass
+    rows = market_rows(3)
+    series = inflation_series()
+    coarse = build_user_content(PROFILE, rows, series, token_budget=100000)
+    budget = estimate_tokens(coarse) - 20
+    content = build_user_content(PROFILE, rows, series, token_budget=budget)
+    assert estimate_tokens(content) <= budget
+    assert "3-month averages" not in content
+
+
+def test_build_user_content_drops_old_months_when_nothing_else_fits():
+    content = build_user_content(PROFILE, market_rows(12), inflation_series(), token_budget=100)
+    assert "Inflation Rates" not in content
+    assert content.startswith("City: Warszawa\n")
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from quantile_sketch import TDigest
+
+QUANTILES = [0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99]
+# Largest allowed distance between q and the exact rank of the estimated q-quantile
+RANK_ERROR = 0.01
+
+
+def rank_error(values, estimate, q):
+    return abs((values < estimate).mean() - q)
+
+
+@pytest.fixture
+def prices():
+    # Skewed like listing prices, with repeated round values
+    rng = np.random.default_rng(0)
+    return np.round(rng.lognormal(13, 0.5, 50000), -3)
+
+
+def test_quantiles_within_rank_error(prices):
+    digest = TDigest.from_values(prices)
+    assert digest.count == len(prices)
+    assert len(digest.means) <= digest.compression
+    for q in QUANTILES:
+        assert rank_error(prices, digest.quantile(q), q) <= RANK_ERROR
+
+
+def test_merged_digests_within_rank_error(prices):
+    digest = TDigest.merge_all([TDigest.from_values(part) for part in np.array_split(prices, 40)])
+    assert digest.count == len(prices)
+    for q in QUANTILES:
+        assert rank_error(prices, digest.quantile(q), q) <= RANK_ERROR
+
+
+def test_round_trip_and_min_max(prices):
+    digest = TDigest.from_dict(TDigest.from_values(prices).to_dict())
+    assert digest.quantile(0) == prices.min()
+    assert digest.quantile(1) == prices.max()
+    assert digest.quantile(0.5) == pytest.approx(np.median(prices), rel=0.01)
+
+
+def test_small_and_empty_inputs():
+    assert TDigest.from_values([5.0]).quantile(0.5) == 5.0
+    assert TDigest.from_values([1.0, 2.0, 3.0]).quantile(0.5) == 2.0
+    assert np.isnan(TDigest.from_values([np.nan]).quantile(0.5))
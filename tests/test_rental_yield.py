@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+from market_cube import ALL_ROOMS
+from rental_yield import ALL_SIZES, ANY, MIN_LISTINGS, SIZE_BANDS, cell_medians, yield_lookup, yield_matrix
+from snapshot_store import period_code
+
+PERIOD = period_code(2024, 6)
+
+
+def listings(groups, period=PERIOD):
+    # groups: [(count, rooms, square meters, price), ...]
+    rows = [(period, rooms, square_meters, price) for count, rooms, square_meters, price in groups for _ in range(count)]
+    return pd.DataFrame(rows, columns=['period', 'rooms', 'squareMeters', 'price'])
+
+
+@pytest.fixture
+def lookup():
+    sale = listings([
+        (5, 2, 40, 400000),    # 10000 PLN/m2, 40 m2 is the first size in 40_60
+        (5, 2, 59, 590000),    # 10000 PLN/m2
+        (10, 3, 100, 800000),  # 8000 PLN/m2, 100 m2 is the first size over 100
+    ])
+    rent = listings([
+        (5, 2, 40, 2000),      # 50 PLN/m2
+        (5, 2, 59, 2950),      # 50 PLN/m2
+        (MIN_LISTINGS - 1, 3, 100, 6000),  # too few rentals for a 3-room cell of its own
+    ])
+    # A month with rentals only has no yield
+    rent = pd.concat([rent, listings([(10, 2, 50, 2500)], period=PERIOD + 1)])
+    return yield_lookup(yield_matrix(sale, rent))
+
+
+def test_yields_are_hand_computed(lookup):
+    two_rooms = {'gross_yield': 6.0, 'sale_price_per_m2': 10000.0, 'rent_price_per_m2': 50.0, 'sale_count': 10, 'rent_count': 10}
+    assert lookup[(PERIOD, 2, '40_60')] == pytest.approx(two_rooms)
+    assert lookup[(PERIOD, 2, ALL_SIZES)] == pytest.approx(two_rooms)
+    assert lookup[(PERIOD, ALL_ROOMS, '40_60')] == pytest.approx(two_rooms)
+    # Every listing: sale per m2 median of ten 8000s and ten 10000s, rent per m2 median of ten 50s
+    # and four 60s
+    assert lookup[(PERIOD, ALL_ROOMS, ALL_SIZES)] == pytest.approx({
+        'gross_yield': 12 * 50 / 9000 * 100, 'sale_price_per_m2': 9000.0, 'rent_price_per_m2': 50.0,
+        'sale_count': 20, 'rent_count': 14,
+    })
+
+
+def test_cells_below_min_listings_are_dropped(lookup):
+    assert set(lookup) == {
+        (PERIOD, 2, '40_60'), (PERIOD, 2, ALL_SIZES), (PERIOD, ALL_ROOMS, '40_60'), (PERIOD, ALL_ROOMS, ALL_SIZES),
+    }
+
+
+@pytest.mark.parametrize('square_meters, band', [
+    (20, 'under_40'), (39.9, 'under_40'), (40, '40_60'), (59.9, '40_60'), (60, '60_80'),
+    (80, '80_100'), (99, '80_100'), (100, 'over_100'), (250, 'over_100'),
+])
+def test_size_band_edges(square_meters, band):
+    cells = cell_medians(listings([(1, 2, square_meters, 500000)]))
+    assert (PERIOD, 2, SIZE_BANDS.index(band)) in cells.index
+    # Plus the rolled-up cells: all rooms in this band, all sizes for 2 rooms, and everything
+    assert set(cells.index) == {
+        (PERIOD, 2, SIZE_BANDS.index(band)), (PERIOD, ANY, SIZE_BANDS.index(band)), (PERIOD, 2, ANY), (PERIOD, ANY, ANY),
+    }
@@ -0,0 +1,78 @@
+import time
+
+from response_cache import ResponseCache, request_key
+
+API_REQUEST = {"model": "gpt-4", "messages": [{"role": "user", "content": "Advice please"}], "temperature": 0.7}
+
+
+def request(number):
+    return dict(API_REQUEST, messages=[{"role": "user", "content": f"Question {number}"}])
+
+
+def test_key_ignores_stream_and_key_order():
+    reordered = dict(reversed(list(API_REQUEST.items())))
+    assert request_key(reordered) == request_key(API_REQUEST)
+    assert request_key(dict(API_REQUEST, stream=True)) == request_key(dict(API_REQUEST, stream=False)) == request_key(API_REQUEST)
+    assert request_key(dict(API_REQUEST, temperature=0.2)) != request_key(API_REQUEST)
+
+
+def test_streamed_and_whole_replies_share_an_entry():
+    cache = ResponseCache()
+    cache.set(dict(API_REQUEST, stream=True), "Buy")
+    assert cache.get(dict(API_REQUEST, stream=False)) == "Buy"
+
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    for path in (None, str(tmp_path / "responses.db")):
+        cache = ResponseCache(ttl=0.2, path=path)
+        cache.set(API_REQUEST, "Buy")
+        assert cache.get(API_REQUEST) == "Buy"
+        time.sleep(0.3)
+        assert cache.get(API_REQUEST) is None
+        cache.close()
+
+
+def test_replies_persist_across_instances(tmp_path):
+    path = str(tmp_path / "responses.db")
+    first = ResponseCache(path=path)
+    first.set(API_REQUEST, "Buy")
+    first.close()
+
+    second = ResponseCache(path=path)
+    assert second.get(API_REQUEST) == "Buy"
+    assert second.stats() == dict(second.stats(), hits=1, misses=0, memory_entries=1)
+    second.close()
+    # Expired rows are not served from disk either
+    expired = ResponseCache(path=path, ttl=0)
+    expired.set(request(1), "Sell")
+    expired.close()
+    assert ResponseCache(path=path).get(request(1)) is None
+
+
+def test_disk_keeps_the_most_recently_used_entries(tmp_path):
+    path = str(tmp_path / "responses.db")
+    cache = ResponseCache(path=path, max_disk_entries=3)
+    for number in range(3):
+        cache.set(request(number), f"Reply {number}")
+        time.sleep(0.01)
+    # Reading entry 0 from disk makes it the most recently used, so entry 1 is dropped next
+    fresh = ResponseCache(path=path, max_disk_entries=3)
+    assert fresh.get(request(0)) == "Reply 0"
+    time.sleep(0.01)
+    fresh.set(request(3), "Reply 3")
+    cache.close()
+    fresh.close()
+
+    reopened = ResponseCache(path=path)
+    assert reopened.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 3
+    assert [reopened.get(request(number)) for number in range(4)] == ["Reply 0", None, "Reply 2", "Reply 3"]
+    reopened.close()
+
+
+def test_memory_lru_is_bounded():
+    cache = ResponseCache(max_entries=2)
+    for number in range(3):
+        cache.set(request(number), f"Reply {number}")
+    assert cache.get(request(0)) is None
+    assert cache.get(request(2)) == "Reply 2"
+    assert cache.stats()['memory_entries'] == 2
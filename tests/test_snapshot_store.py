@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from snapshot_store import downcast
+
+
+def test_downcast_keeps_values_that_fit():
+    values = downcast(np.array([0.0, 250.0, 65535.0]), 'uint16')
+    assert values.dtype == np.uint16
+    assert values.tolist() == [0, 250, 65535]
+
+
+@pytest.mark.parametrize('values', [
+    np.array([1.0, -1.0]),
+    np.array([1.0, 70000.0]),
+    np.array([1.0, np.nan]),
+    np.array([np.nan, np.nan]),
+    np.array([1.0, np.inf]),
+])
+def test_downcast_rejects_values_that_do_not_fit(values):
+    with pytest.raises(ValueError):
+        downcast(values, 'uint16')
+
+
+def test_downcast_leaves_float_columns_alone():
+    values = downcast(np.array([1.5, np.nan]), 'float32')
+    assert values.dtype == np.float32
+    assert np.isnan(values[1])
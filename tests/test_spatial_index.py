@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+import parser_1
+from listing_ids import ID_DTYPE, id_hex
+from spatial_index import CELL_KM, SpatialIndex, build_grid, project
+
+
+@pytest.mark.parametrize('manifest', [
+    {},
+    {'sale/2024_01': {'kind': 'sale', 'year': 2024, 'month': 1, 'cities': ['krakow'], 'sha1': 'x'}},
+])
+def test_spatial_index_without_partition_raises_unknown_city(monkeypatch, manifest):
+    monkeypatch.setattr(parser_1, 'get_manifest', lambda: manifest)
+    with pytest.raises(parser_1.UnknownCityError):
+        parser_1.get_spatial_index('sale', 'warszawa')
+
+
+@pytest.fixture(scope='module')
+def listings():
+    # A few thousand listings scattered over ~6 x 6 km around central Warsaw
+    rng = np.random.default_rng(2)
+    count = 3000
+    latitude = 52.23 + rng.uniform(-0.03, 0.03, count)
+    longitude = 21.01 + rng.uniform(-0.045, 0.045, count)
+    arrays = {
+        'id': np.array([bytes.fromhex(f"{row:032x}") for row in range(count)], dtype=ID_DTYPE),
+        'price': rng.integers(300, 1500, count).astype('uint32') * 1000,
+        'rooms': rng.integers(1, 5, count).astype('uint8'),
+        'squareMeters': rng.integers(20, 120, count).astype('uint16'),
+    }
+    arrays.update(build_grid(latitude, longitude))
+    return arrays
+
+
+def brute_force(arrays, latitude, longitude, radius_km, rooms=None):
+    # Distance from the point to every listing, over the same projected coordinates the index uses
+    x0, y0 = project(latitude, longitude)
+    distances = np.hypot(arrays['grid_x'] - float(x0), arrays['grid_y'] - float(y0))
+    mask = distances <= radius_km
+    if rooms is not None:
+        mask &= arrays['rooms'] == rooms
+    return np.flatnonzero(mask), distances
+
+
+# Radii below, equal to and several times the 0.5 km cell, at points on and between cell edges
+QUERIES = [
+    (52.23, 21.01, 0.3, None),
+    (52.23, 21.01, CELL_KM, 2),
+    (52.2412, 21.0033, 0.7, None),
+    (52.2157, 21.0310, 1.3, 3),
+    (52.25, 21.05, 2.0, None),
+    (52.30, 21.20, 1.0, None),
+]
+
+
+@pytest.mark.parametrize('latitude, longitude, radius_km, rooms', QUERIES)
+def test_within_matches_brute_force(listings, latitude, longitude, radius_km, rooms):
+    index = SpatialIndex(listings)
+    rows, distances = index.within(latitude, longitude, radius_km, rooms)
+    expected, all_distances = brute_force(listings, latitude, longitude, radius_km, rooms)
+    assert sorted(rows.tolist()) == expected.tolist()
+    assert np.allclose(distances, all_distances[rows])
+
+
+@pytest.mark.parametrize('latitude, longitude, radius_km, rooms', QUERIES)
+def test_median_price_per_m2_matches_brute_force(listings, latitude, longitude, radius_km, rooms):
+    summary = SpatialIndex(listings).median_price_per_m2(latitude, longitude, radius_km, rooms)
+    expected, _ = brute_force(listings, latitude, longitude, radius_km, rooms)
+    assert summary['count'] == len(expected)
+    if len(expected):
+        price_per_m2 = listings['price'][expected] / listings['squareMeters'][expected]
+        assert summary['median_price_per_m2'] == pytest.approx(np.median(price_per_m2))
+    else:
+        assert np.isnan(summary['median_price_per_m2'])
+
+
+@pytest.mark.parametrize('latitude, longitude, k, rooms', [
+    (52.23, 21.01, 5, None),
+    (52.2412, 21.0033, 10, 2),
+    # Outside the listings: the search widens across many empty cells
+    (52.30, 21.20, 3, None),
+])
+def test_nearest_matches_brute_force(listings, latitude, longitude, k, rooms):
+    nearest = SpatialIndex(listings).nearest(latitude, longitude, k, rooms)
+    candidates, distances = brute_force(listings, latitude, longitude, np.inf, rooms)
+    expected = candidates[np.argsort(distances[candidates], kind='stable')[:k]]
+    assert [listing['id'] for listing in nearest] == [id_hex(listings['id'][row]) for row in expected]
+    assert [listing['distance_km'] for listing in nearest] == [round(float(distances[row]), 3) for row in expected]
+    assert all(listing['rooms'] == rooms for listing in nearest if rooms is not None)